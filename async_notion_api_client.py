@@ -0,0 +1,397 @@
+from collections import deque
+from typing import Dict, List, Any, Iterable
+import asyncio
+import importlib.util
+import os
+import time
+import httpx
+from notion_client import AsyncClient
+from notion_client.errors import HTTPResponseError
+from tqdm import tqdm
+from notion_api_client import EndpointRenderer, ENDPOINT_DATABASE_PROPERTIES
+from sync_manifest import SyncManifest
+from block_uploader import BlockUploader
+from request_planner import RequestPlanner, PlannedRequest, count_blocks
+from rate_limiter import AsyncRateLimiter
+from checkpoint_journal import CheckpointJournal
+from metrics import Metrics
+
+# h2がインストールされていればHTTP/2で接続する
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+class AsyncBlockUploader:
+    # BlockUploaderのasyncio版
+    # 同じ親への追加は順番に送り、別の親（トグルの中身やタグのページ）への追加は並行して送る
+    def __init__(self, client: AsyncClient, rate_limiter: AsyncRateLimiter, concurrency: int = 1, progress=None, journal: CheckpointJournal = None, metrics: Metrics = None):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.concurrency = max(1, concurrency)
+        self.progress = progress
+        self.journal = journal
+        self.metrics = metrics or Metrics()
+        self.blocks_uploaded = 0
+        self.blocks_skipped = 0
+        self.requests_sent = 0
+        self._chunk_sequence: Dict[str, int] = {}
+        self._started_at = None
+        self._finished_at = None
+        self._tasks = set()
+        # 同時に送信中のリクエスト数の上限（全体のレートはレートリミッターで守る）
+        self._in_flight = asyncio.Semaphore(self.concurrency)
+        # 作成待ちのデータベースの行が溜まり続けないようにする
+        self._row_slots = asyncio.Semaphore(self.concurrency * 4)
+
+    async def append(self, parent_id: str, blocks: List[Any], after: str = None) -> List[str]:
+        block_ids = []
+        for request in self.planner().plan(blocks):
+            request_ids = await self.send(parent_id, request, after)
+            if after is not None and request_ids:
+                after = request_ids[-1]
+            block_ids.extend(request_ids)
+        return block_ids
+
+    async def send(self, parent_id: str, request: PlannedRequest, after: str = None) -> List[str]:
+        block_ids = await self._append_chunk(parent_id, request, after)
+        for index, remainder in request.deferred:
+            await self.append(block_ids[index], remainder)
+        for index, children in request.detached:
+            self.submit(block_ids[index], children)
+        return block_ids
+
+    def planner(self, detach_children: bool = False) -> RequestPlanner:
+        return RequestPlanner(
+            max_blocks=BlockUploader.max_blocks_per_request,
+            max_nested_blocks=BlockUploader.max_nested_blocks_per_request,
+            max_bytes=BlockUploader.max_request_bytes,
+            detach_children=detach_children
+        )
+
+    def submit(self, parent_id: str, blocks: List[Any]) -> None:
+        self.track(asyncio.ensure_future(self.append(parent_id, blocks)))
+
+    def track(self, task: asyncio.Future) -> asyncio.Future:
+        # wait()で終わるのを待ち、cancel()で止められるように、送信中のタスクを記録する
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def create_page(self, parent_id: str, title: str) -> str:
+        if self.journal is not None:
+            key = f"{parent_id}/page:{title}"
+            digest = CheckpointJournal.digest([{'title': title}])
+            page_ids = self.journal.lookup(key, digest)
+            if page_ids is not None:
+                return page_ids[0]
+
+        async with self._in_flight:
+            response = await self.rate_limiter.call(
+                self.metrics.timed_async('pages.create', self.client.pages.create),
+                parent={'page_id': parent_id},
+                properties={'title': {'title': [{'type': 'text', 'text': {'content': title}}]}}
+            )
+        self.requests_sent += 1
+        self.metrics.increment('requests_sent')
+
+        if self.journal is not None:
+            self.journal.record(key, digest, [response['id']])
+        return response['id']
+
+    async def create_database(self, parent_id: str, title: str, properties: Dict[str, Any]) -> str:
+        if self.journal is not None:
+            key = f"{parent_id}/database:{title}"
+            digest = CheckpointJournal.digest([{'title': title, 'properties': properties}])
+            database_ids = self.journal.lookup(key, digest)
+            if database_ids is not None:
+                return database_ids[0]
+
+        async with self._in_flight:
+            response = await self.rate_limiter.call(
+                self.metrics.timed_async('databases.create', self.client.databases.create),
+                parent={'type': 'page_id', 'page_id': parent_id},
+                title=[{'type': 'text', 'text': {'content': title}}],
+                properties=properties
+            )
+        self.requests_sent += 1
+        self.metrics.increment('requests_sent')
+
+        if self.journal is not None:
+            self.journal.record(key, digest, [response['id']])
+        return response['id']
+
+    async def submit_row(self, database_id: str, key: str, properties: Dict[str, Any], blocks: List[Any]) -> None:
+        await self._row_slots.acquire()
+        task = self.track(asyncio.ensure_future(self.create_row(database_id, key, properties, blocks)))
+        task.add_done_callback(lambda _: self._row_slots.release())
+
+    async def create_row(self, database_id: str, key: str, properties: Dict[str, Any], blocks: List[Any]) -> str:
+        # BlockUploader.create_rowと同じく、最初のリクエスト分のブロックは行の作成と同時に送る
+        requests = self.planner().plan(blocks)
+        first = requests[0] if requests and not requests[0].deferred else None
+        children = first.payload if first is not None else []
+
+        page_id = None
+        if self.journal is not None:
+            journal_key = f"{database_id}/row:{key}"
+            digest = CheckpointJournal.digest([properties] + children)
+            page_ids = self.journal.lookup(journal_key, digest)
+            if page_ids is not None:
+                page_id = page_ids[0]
+                if first is not None:
+                    skipped = count_blocks(first.blocks)
+                    self.blocks_skipped += skipped
+                    if self.progress is not None:
+                        self.progress.update(skipped)
+                    self.metrics.increment('blocks_skipped', skipped)
+
+        if page_id is None:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            async with self._in_flight:
+                response = await self.rate_limiter.call(
+                    self.metrics.timed_async('pages.create', self.client.pages.create),
+                    parent={'database_id': database_id},
+                    properties=properties,
+                    children=children
+                )
+            page_id = response['id']
+            uploaded = count_blocks(first.blocks) if first is not None else 0
+            self.requests_sent += 1
+            self.blocks_uploaded += uploaded
+            self._finished_at = time.monotonic()
+            if self.progress is not None and uploaded:
+                self.progress.update(uploaded)
+            self.metrics.increment('requests_sent')
+            self.metrics.increment('blocks_uploaded', uploaded)
+            if first is not None:
+                self.metrics.increment('bytes_sent', first.size)
+            if self.journal is not None:
+                self.journal.record(journal_key, digest, [page_id])
+
+        for request in requests[1:] if first is not None else requests:
+            await self.send(page_id, request)
+        return page_id
+
+    async def delete(self, block_ids: List[str]) -> None:
+        await asyncio.gather(*(self._delete_block(block_id) for block_id in block_ids))
+
+    async def wait(self) -> None:
+        # 切り離した子ブロックの追加がさらにタスクを作ることがあるので、なくなるまで待つ
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+    async def cancel(self) -> None:
+        # 失敗したときに、残っているリクエストを止めてから接続を閉じられるようにする
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def elapsed(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        return (self._finished_at or time.monotonic()) - self._started_at
+
+    @property
+    def blocks_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.blocks_uploaded / elapsed if elapsed > 0 else 0.0
+
+    async def _append_chunk(self, parent_id: str, request: PlannedRequest, after: str = None) -> List[str]:
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        sequence = self._chunk_sequence.get(parent_id, 0)
+        self._chunk_sequence[parent_id] = sequence + 1
+
+        chunk, children = request.blocks, request.payload
+        if self.journal is not None:
+            key = f"{parent_id}/{sequence}"
+            digest = CheckpointJournal.digest(children)
+            block_ids = self.journal.lookup(key, digest)
+            if block_ids is not None:
+                skipped = count_blocks(chunk)
+                self.blocks_skipped += skipped
+                if self.progress is not None:
+                    self.progress.update(skipped)
+                self.metrics.increment('blocks_skipped', skipped)
+                return block_ids
+
+        kwargs = {'after': after} if after is not None else {}
+        try:
+            async with self._in_flight:
+                response = await self.rate_limiter.call(
+                    self.metrics.timed_async('blocks.children.append', self.client.blocks.children.append),
+                    block_id=parent_id,
+                    children=children,
+                    **kwargs
+                )
+        except Exception as e:
+            print(f"\nFailed to upload {len(chunk)} blocks to {parent_id}: {e}")
+            raise
+
+        uploaded = count_blocks(chunk)
+        self.requests_sent += 1
+        self.blocks_uploaded += uploaded
+        self._finished_at = time.monotonic()
+        if self.progress is not None:
+            self.progress.update(uploaded)
+        self.metrics.increment('requests_sent')
+        self.metrics.increment('blocks_uploaded', uploaded)
+        self.metrics.increment('bytes_sent', request.size)
+
+        block_ids = [block['id'] for block in response.get('results', [])]
+        if self.journal is not None:
+            self.journal.record(key, digest, block_ids)
+        return block_ids
+
+    async def _delete_block(self, block_id: str) -> None:
+        try:
+            async with self._in_flight:
+                await self.rate_limiter.call(self.metrics.timed_async('blocks.delete', self.client.blocks.delete), block_id=block_id)
+        except HTTPResponseError as e:
+            if e.status not in (400, 404):
+                raise
+        self.requests_sent += 1
+        self.metrics.increment('requests_sent')
+
+
+class AsyncBlockStream:
+    # BlockStreamのasyncio版: リクエストを送信している間も次のブロックを詰め続ける
+    def __init__(self, uploader: AsyncBlockUploader, parent_id: str, after: str = None, max_pending_requests: int = 2):
+        self.uploader = uploader
+        self.parent_id = parent_id
+        self.after = after
+        self.block_ids: List[str] = []
+        self.max_pending_requests = max_pending_requests
+        self._planner = uploader.planner(detach_children=uploader.concurrency > 1)
+        self._pending = deque()
+
+    async def add(self, blocks: List[Any]) -> None:
+        for block in blocks:
+            request = self._planner.add(block)
+            if request is not None:
+                await self._flush(request)
+
+    async def close(self) -> List[str]:
+        request = self._planner.finish()
+        if request is not None:
+            await self._flush(request)
+        while self._pending:
+            await self._pending.popleft()
+        await self.uploader.wait()
+        return self.block_ids
+
+    async def _flush(self, request: PlannedRequest) -> None:
+        while len(self._pending) >= self.max_pending_requests:
+            await self._pending.popleft()
+        # 同じ親への追加は前のリクエストが終わってから送る
+        previous = self._pending[-1] if self._pending else None
+        self._pending.append(self.uploader.track(asyncio.ensure_future(self._write(previous, request))))
+
+    async def _write(self, previous, request: PlannedRequest) -> None:
+        if previous is not None:
+            await previous
+        block_ids = await self.uploader.send(self.parent_id, request, self.after)
+        if self.after is not None and block_ids:
+            self.after = block_ids[-1]
+        self.block_ids.extend(block_ids)
+
+
+class AsyncNotionAPIClient(EndpointRenderer):
+    # notion_client.AsyncClient を使うNotionAPIClient
+    # キープアライブのコネクションプールを使い回し、h2があればHTTP/2で接続する
+    # レンダリングはNotionAPIClientと共通（EndpointRenderer）で、公開処理だけがコルーチンになる
+    # 同期版の差分更新（--sync）とバッチモードのアップロードはスレッドを使うので、NotionAPIClientだけが持つ
+    def __init__(self, token: str = None, base_url: str = None, rate_limiter: AsyncRateLimiter = None, metrics: Metrics = None,
+                 client: AsyncClient = None, max_connections: int = 10, http2: bool = None):
+        super().__init__(metrics=metrics)
+        self.token = token or os.getenv('NOTION_TOKEN')
+        if client is None and not self.token:
+            raise ValueError("Notion token is required. Set NOTION_TOKEN environment variable or pass token parameter.")
+        self.base_url = base_url or os.getenv('NOTION_BASE_URL')
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        if client is None:
+            http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=30.0)
+            )
+            options = {'auth': self.token, 'base_url': self.base_url} if self.base_url else {'auth': self.token}
+            client = AsyncClient(client=http_client, **options)
+        self.client = client
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> 'AsyncNotionAPIClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def create_endpoint_documentation(self, page_id: str, endpoints: Iterable[Dict[str, Any]], include_errors: bool = False, batch_size: int = 5, verify_page: bool = False, toggle_mode: bool = False, concurrency: int = 1, journal_path: str = None, resume: bool = False, layout: str = 'single') -> None:
+        page_id = self._normalize_page_id(page_id)
+
+        if verify_page:
+            try:
+                page = await self.rate_limiter.call(self.metrics.timed_async('pages.retrieve', self.client.pages.retrieve), page_id)
+                print(f"Successfully connected to page: {page.get('properties', {}).get('title', {}).get('title', [{}])[0].get('plain_text', 'Untitled')}")
+            except Exception as e:
+                print(f"Error accessing page {page_id}: {e}")
+                raise
+        else:
+            print(f"Connecting to Notion page: {page_id}")
+
+        total = len(endpoints) if hasattr(endpoints, '__len__') else None
+        journal = CheckpointJournal(journal_path, page_id, resume=resume) if journal_path else None
+        if journal is not None and resume:
+            print(f"Resuming upload: {len(journal.entries)} requests already completed")
+        uploader = AsyncBlockUploader(self.client, self.rate_limiter, concurrency=concurrency, journal=journal, metrics=self.metrics)
+        try:
+            with tqdm(total=total, desc="Publishing endpoints") as pbar:
+                if layout == 'tag-pages':
+                    await self._publish_tag_pages_async(page_id, endpoints, uploader, include_errors, toggle_mode, pbar)
+                elif layout == 'database':
+                    await self._publish_database_async(page_id, endpoints, uploader, include_errors, toggle_mode, pbar)
+                else:
+                    await self._publish_blocks_async(page_id, endpoints, uploader, include_errors, toggle_mode, pbar)
+        finally:
+            # 失敗した場合に、送信中のタスクが閉じた接続を使い続けないようにする
+            await uploader.cancel()
+            if journal is not None:
+                journal.close()
+
+        self._print_upload_summary(uploader)
+
+    async def _publish_blocks_async(self, parent_id: str, endpoints: Iterable[Dict[str, Any]], uploader: AsyncBlockUploader, include_errors: bool, toggle_mode: bool, pbar) -> None:
+        stream = AsyncBlockStream(uploader, parent_id)
+        for endpoint in endpoints:
+            await stream.add(self._render_for_upload(endpoint, include_errors, toggle_mode))
+            pbar.update(1)
+            # レンダリングの合間に、送信中のリクエストの応答を処理させる
+            await asyncio.sleep(0)
+        await stream.close()
+
+    async def _publish_tag_pages_async(self, page_id: str, endpoints: Iterable[Dict[str, Any]], uploader: AsyncBlockUploader, include_errors: bool, toggle_mode: bool, pbar) -> None:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for endpoint in endpoints:
+            tag = endpoint['tags'][0] if endpoint['tags'] else 'Untagged'
+            groups.setdefault(tag, []).append(endpoint)
+        tags = list(groups)
+
+        page_ids = dict(zip(tags, await asyncio.gather(*(uploader.create_page(page_id, tag) for tag in tags))))
+        await uploader.append(page_id, self._create_tag_index_blocks(tags, page_ids, groups))
+        await asyncio.gather(*(
+            self._publish_blocks_async(page_ids[tag], groups[tag], uploader, include_errors, toggle_mode, pbar)
+            for tag in tags
+        ))
+
+    async def _publish_database_async(self, page_id: str, endpoints: Iterable[Dict[str, Any]], uploader: AsyncBlockUploader, include_errors: bool, toggle_mode: bool, pbar) -> None:
+        database_id = await uploader.create_database(page_id, 'API Endpoints', ENDPOINT_DATABASE_PROPERTIES)
+        for endpoint in endpoints:
+            blocks = self._render_for_upload(endpoint, include_errors, toggle_mode)
+            await uploader.submit_row(database_id, SyncManifest.endpoint_key(endpoint), self._create_endpoint_row_properties(endpoint), blocks)
+            pbar.update(1)
+            await asyncio.sleep(0)
+        await uploader.wait()
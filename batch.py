@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Tuple
+import logging
+import yaml
+from tqdm import tqdm
+from openapi_parser import OpenAPIParser, __version__
+from spec_cache import SpecCache, default_cache_dir
+from notion_api_client import NotionAPIClient, EndpointRenderer
+from preflight import PreflightError
+from rate_limiter import RateLimiter
+from metrics import Metrics
+
+
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    return logging.getLogger(__name__)
+
+
+def load_manifest(path: str) -> List[Tuple[str, str]]:
+    # 仕様ファイルのパスとNotionのページIDの対応（YAMLまたはJSON）
+    #   path/to/users.yaml: <page-id>
+    # または
+    #   specs:
+    #     - openapi: path/to/users.yaml
+    #       notion_page_id: <page-id>
+    with open(path, 'r', encoding='utf-8') as file:
+        data = yaml.safe_load(file) or {}
+
+    if isinstance(data, dict) and 'specs' in data:
+        entries = [(item['openapi'], item['notion_page_id']) for item in data['specs']]
+    elif isinstance(data, dict):
+        entries = list(data.items())
+    else:
+        raise ValueError(f"Batch manifest {path} must map spec paths to Notion page IDs")
+
+    # 相対パスはマニフェストのあるディレクトリからのパスとして扱う
+    base = os.path.dirname(os.path.abspath(path))
+    return [(os.path.join(base, spec_path), str(page_id)) for spec_path, page_id in entries]
+
+
+def render_spec(spec_path: str, include_errors: bool, toggle_mode: bool, cache_dir: str = None) -> Dict[str, Any]:
+    # ワーカープロセスで実行する: 仕様のパースとブロックのレンダリング（CPUを使う部分）
+    # Notion APIは呼ばないので、トークンのいらないレンダラーを使う
+    metrics = Metrics()
+    cache = SpecCache(cache_dir, __version__) if cache_dir else None
+    openapi_parser = OpenAPIParser(spec_path, cache=cache, metrics=metrics)
+    renderer = EndpointRenderer(metrics=metrics)
+    blocks = [
+        block
+        for endpoint_blocks in renderer.iter_endpoint_blocks(openapi_parser.iter_endpoints(), include_errors, toggle_mode)
+        for block in endpoint_blocks
+    ]
+    # 直せない問題があれば、この仕様はアップロードを始めずに失敗させる
+    if renderer.validator.issues:
+        raise PreflightError(renderer.validator.issues)
+    return {'blocks': blocks, 'endpoints': openapi_parser.count_endpoints(), 'phases': metrics.phases}
+
+
+def main():
+    logger = setup_logging()
+
+    parser = argparse.ArgumentParser(
+        description='Publish many OpenAPI specifications to Notion pages in one run'
+    )
+    parser.add_argument(
+        '--manifest',
+        required=True,
+        help='YAML or JSON file mapping OpenAPI spec paths to Notion page IDs'
+    )
+    parser.add_argument(
+        '--notion-token',
+        help='Notion integration token (can also be set via NOTION_TOKEN env variable)'
+    )
+    parser.add_argument(
+        '--include-errors',
+        action='store_true',
+        help='Include error responses (4xx, 5xx) in the documentation'
+    )
+    parser.add_argument(
+        '--toggle-mode',
+        action='store_true',
+        help='Create endpoints inside toggle blocks for better organization'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes parsing and rendering specs (default: number of CPUs)'
+    )
+    parser.add_argument(
+        '--upload-workers',
+        type=int,
+        default=4,
+        help='Number of pages uploaded at the same time; all uploads share one rate limiter (default: 4)'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help='Number of concurrent upload workers per page for independent blocks such as toggle contents (default: 1)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume interrupted uploads, skipping requests recorded in the checkpoint journals'
+    )
+    parser.add_argument(
+        '--journal-dir',
+        default='.notion_journal',
+        help='Directory for the per-page checkpoint journals (default: .notion_journal)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=default_cache_dir(),
+        help='Directory for the parsed specification cache (default: ~/.cache/openapi-to-notion)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the parsed specification cache'
+    )
+    parser.add_argument(
+        '--metrics-out',
+        help='Write per-phase timings, Notion request latencies and counters to this file'
+    )
+    parser.add_argument(
+        '--metrics-format',
+        choices=['json', 'prometheus'],
+        default='json',
+        help='Format of the --metrics-out file (default: json)'
+    )
+
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    try:
+        specs = load_manifest(args.manifest)
+        logger.info(f"Publishing {len(specs)} specifications from {args.manifest}")
+        # 全てのページのアップロードで1つのレートリミッターを共有する
+        notion_client = NotionAPIClient(token=args.notion_token, rate_limiter=RateLimiter(), metrics=metrics)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Configuration error: {e}")
+        sys.exit(1)
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    failed = []
+    try:
+        with metrics.phase('publish'), \
+                ProcessPoolExecutor(max_workers=max(1, args.workers)) as renderers, \
+                ThreadPoolExecutor(max_workers=max(1, args.upload_workers)) as uploaders, \
+                tqdm(desc="Uploading blocks") as pbar:
+            rendering = {
+                renderers.submit(render_spec, spec_path, args.include_errors, args.toggle_mode, cache_dir): (spec_path, page_id)
+                for spec_path, page_id in specs
+            }
+            uploading = {}
+            # レンダリングが終わった仕様から順にアップロードを始める
+            for future in as_completed(rendering):
+                spec_path, page_id = rendering[future]
+                try:
+                    rendered = future.result()
+                except PreflightError as e:
+                    logger.error(f"Failed to render {spec_path}: {e}")
+                    for issue in e.issues:
+                        logger.error(f"  {issue}")
+                    failed.append(spec_path)
+                    continue
+                except Exception as e:
+                    logger.error(f"Failed to render {spec_path}: {e}")
+                    failed.append(spec_path)
+                    continue
+                # ワーカーの所要時間だけを足す（回数は親のフェーズの回数として数えない）
+                for name, phase in rendered['phases'].items():
+                    metrics.add_phase_time(name, phase['seconds'], count=0)
+                logger.info(f"Rendered {rendered['endpoints']} endpoints from {spec_path}")
+                journal_path = os.path.join(args.journal_dir, f"{page_id.replace('-', '')}.jsonl")
+                upload = uploaders.submit(
+                    notion_client.upload_rendered_blocks,
+                    page_id,
+                    rendered['blocks'],
+                    concurrency=args.concurrency,
+                    journal_path=journal_path,
+                    resume=args.resume,
+                    progress=pbar
+                )
+                uploading[upload] = spec_path
+
+            for future in as_completed(uploading):
+                spec_path = uploading[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Failed to upload {spec_path}: {e}")
+                    failed.append(spec_path)
+    finally:
+        if args.metrics_out:
+            metrics.increment('retries', notion_client.rate_limiter.retry_count)
+            metrics.increment('throttles', notion_client.rate_limiter.throttle_count)
+            metrics.write(args.metrics_out, args.metrics_format)
+            logger.info(f"Metrics written to {args.metrics_out}")
+
+    uploaded = metrics.counters.get('blocks_uploaded', 0)
+    logger.info(f"Uploaded {uploaded} blocks for {len(specs) - len(failed)} of {len(specs)} specifications "
+                f"({notion_client.rate_limiter.retry_count} retries, {notion_client.rate_limiter.throttle_count} throttled)")
+    if failed:
+        logger.error(f"Failed specifications: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openapi_parser import OpenAPIParser, orjson  # noqa: E402
+from synthetic_spec import generate_spec  # noqa: E402
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare OpenAPI spec loading paths')
+    parser.add_argument('--endpoints', type=int, default=5000)
+    parser.add_argument('--schemas', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    spec = generate_spec(endpoints=args.endpoints, schemas=args.schemas)
+    with tempfile.TemporaryDirectory() as tmp:
+        yaml_path = os.path.join(tmp, 'spec.yaml')
+        json_path = os.path.join(tmp, 'spec.json')
+        with open(yaml_path, 'w', encoding='utf-8') as file:
+            yaml.dump(spec, file, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper), sort_keys=False)
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(spec, file)
+
+        with open(yaml_path, 'r', encoding='utf-8') as file:
+            yaml_text = file.read()
+        with open(json_path, 'r', encoding='utf-8') as file:
+            json_text = file.read()
+
+        results = {
+            'yaml.safe_load (pure Python)': best_of(args.repeat, lambda: yaml.load(yaml_text, Loader=yaml.SafeLoader)),
+            'OpenAPIParser YAML': best_of(args.repeat, lambda: OpenAPIParser(yaml_path)),
+            'json.loads': best_of(args.repeat, lambda: json.loads(json_text)),
+            'OpenAPIParser JSON': best_of(args.repeat, lambda: OpenAPIParser(json_path)),
+        }
+        if yaml.__with_libyaml__:
+            results['yaml CSafeLoader'] = best_of(args.repeat, lambda: yaml.load(yaml_text, Loader=yaml.CSafeLoader))
+        if orjson is not None:
+            results['orjson.loads'] = best_of(args.repeat, lambda: orjson.loads(json_text))
+
+        print(f"Spec size: YAML {os.path.getsize(yaml_path) / 1e6:.1f} MB, JSON {os.path.getsize(json_path) / 1e6:.1f} MB")
+        baseline = results['yaml.safe_load (pure Python)']
+        for name, seconds in sorted(results.items(), key=lambda item: item[1], reverse=True):
+            print(f"{name:32s} {seconds:8.3f}s  {baseline / seconds:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blocks import to_notion_blocks  # noqa: E402
+from notion_api_client import NotionAPIClient  # noqa: E402
+from openapi_parser import OpenAPIParser  # noqa: E402
+from request_planner import count_blocks  # noqa: E402
+from synthetic_spec import generate_spec  # noqa: E402
+
+
+def measure(func):
+    # 戻り値を保持したまま、確保されているメモリ量とピークを測る
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare memory held by rendered blocks as compact blocks and as Notion JSON dicts')
+    parser.add_argument('--endpoints', type=int, default=5000)
+    parser.add_argument('--schemas', type=int, default=500)
+    parser.add_argument('--toggle-mode', action='store_true')
+    args = parser.parse_args()
+
+    spec = generate_spec(endpoints=args.endpoints, schemas=args.schemas)
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = os.path.join(tmp, 'spec.json')
+        with open(spec_path, 'w', encoding='utf-8') as file:
+            json.dump(spec, file)
+        endpoints = OpenAPIParser(spec_path).get_endpoints()
+
+    def render(expand):
+        client = NotionAPIClient(token='benchmark')
+        rendered = []
+        for blocks in client.iter_endpoint_blocks(endpoints, toggle_mode=args.toggle_mode):
+            # 以前の実装はレンダリングの時点でNotion APIの辞書を作っていた
+            rendered.append(to_notion_blocks(blocks) if expand else blocks)
+        return rendered
+
+    dicts, dicts_current, dicts_peak = measure(lambda: render(True))
+    total = sum(count_blocks(blocks) for blocks in dicts)
+    del dicts
+    compact, compact_current, compact_peak = measure(lambda: render(False))
+    del compact
+
+    print(f"Rendered {total} blocks from {len(endpoints)} endpoints ({'toggle' if args.toggle_mode else 'flat'} mode)")
+    print(f"{'Notion JSON dicts':20s} held {dicts_current / 1e6:8.1f} MB  peak {dicts_peak / 1e6:8.1f} MB")
+    print(f"{'compact blocks':20s} held {compact_current / 1e6:8.1f} MB  peak {compact_peak / 1e6:8.1f} MB")
+    print(f"{'reduction':20s}      {dicts_current / compact_current:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notion_api_client import NotionAPIClient  # noqa: E402
+from openapi_parser import OpenAPIParser  # noqa: E402
+from request_planner import count_blocks  # noqa: E402
+from synthetic_spec import generate_spec  # noqa: E402
+
+
+def render(endpoints, toggle_mode, include_errors):
+    # レンダリングのキャッシュも含めて測るため、毎回新しいクライアントを使う
+    client = NotionAPIClient(token='benchmark')
+    # timeitと同じく、計測中はGCを止める
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        rendered = list(client.iter_endpoint_blocks(endpoints, include_errors=include_errors, toggle_mode=toggle_mode))
+        seconds = time.perf_counter() - started
+    finally:
+        gc.enable()
+    return seconds, sum(count_blocks(blocks) for blocks in rendered)
+
+
+def load_endpoints(spec):
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = os.path.join(tmp, 'spec.json')
+        with open(spec_path, 'w', encoding='utf-8') as file:
+            json.dump(spec, file)
+        endpoints = OpenAPIParser(spec_path).get_endpoints()
+    # スキーマの解決はレンダリングに含めない
+    for endpoint in endpoints:
+        for status_code in endpoint['responses']:
+            endpoint['responses'][status_code]
+        endpoint['parameters'], endpoint['request_body']
+    return endpoints
+
+
+def bench(endpoints, repeat):
+    # 1回目はメモリの確保などで遅くなるので計測しない
+    render(endpoints, False, False)
+    for toggle_mode in (False, True):
+        for include_errors in (False, True):
+            seconds, total = min(render(endpoints, toggle_mode, include_errors) for _ in range(repeat))
+            label = f"{'toggle' if toggle_mode else 'flat'}{' +errors' if include_errors else ''}"
+            print(f"{label:15s} {total:7d} blocks in {seconds * 1000:7.1f} ms  {total / seconds:10.0f} blocks/sec  "
+                  f"{len(endpoints) / seconds:8.0f} endpoints/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how many blocks per second the endpoint renderer produces')
+    parser.add_argument('--endpoints', type=int, default=2000)
+    parser.add_argument('--schemas', type=int, default=200)
+    parser.add_argument('--properties', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--many-refs-properties', type=int, default=20,
+                        help='Properties per model in the many-refs case, where models reference each other several levels deep')
+    args = parser.parse_args()
+
+    print(f"{args.endpoints} endpoints, {args.schemas} schemas, {args.properties} properties")
+    bench(load_endpoints(generate_spec(endpoints=args.endpoints, schemas=args.schemas, properties=args.properties)), args.repeat)
+
+    # 参照の多いモデル: 共有コンポーネントを展開するたびに複製すると、出力が参照の深さで指数的に増える
+    print(f"many refs: 100 endpoints, 100 schemas, {args.many_refs_properties} properties")
+    bench(load_endpoints(generate_spec(endpoints=100, schemas=100, properties=args.many_refs_properties)), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notion_api_client import NotionAPIClient  # noqa: E402
+from openapi_parser import OpenAPIParser  # noqa: E402
+from request_planner import RequestPlanner, block_children, count_blocks, payload_size  # noqa: E402
+from synthetic_spec import generate_spec  # noqa: E402
+
+
+def naive_requests(blocks, planner):
+    # 以前の実装: トップレベルのブロックを100個ずつ区切るだけ
+    total = 0
+    rejected = 0
+    for i in range(0, len(blocks), 100):
+        chunk = blocks[i:i + 100]
+        total += 1
+        children_over = any(len(block_children(block) or []) > planner.max_blocks for block in chunk)
+        if (children_over or count_blocks(chunk) > planner.max_nested_blocks
+                or sum(payload_size(block) for block in chunk) > planner.max_bytes):
+            rejected += 1
+    return total, rejected
+
+
+def planned_requests(blocks, planner):
+    total = 0
+    for request in planner.plan(blocks):
+        total += 1
+        for _, remainder in request.deferred:
+            total += planned_requests(remainder, planner)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare request counts of 100-block slicing and the request planner')
+    parser.add_argument('--endpoints', type=int, default=500)
+    parser.add_argument('--schemas', type=int, default=100)
+    parser.add_argument('--properties', type=int, default=40)
+    args = parser.parse_args()
+
+    spec = generate_spec(endpoints=args.endpoints, schemas=args.schemas, properties=args.properties, ref_probability=0.02)
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = os.path.join(tmp, 'spec.json')
+        with open(spec_path, 'w', encoding='utf-8') as file:
+            json.dump(spec, file)
+        endpoints = OpenAPIParser(spec_path).get_endpoints()
+
+    client = NotionAPIClient(token='benchmark')
+    planner = RequestPlanner()
+    for toggle_mode in (False, True):
+        blocks = [block for endpoint_blocks in client.iter_endpoint_blocks(endpoints, toggle_mode=toggle_mode) for block in endpoint_blocks]
+        before, rejected = naive_requests(blocks, planner)
+        after = planned_requests(blocks, planner)
+        mode = 'toggle' if toggle_mode else 'flat'
+        print(f"{mode:6s} blocks={count_blocks(blocks):7d}  before={before:5d} requests ({rejected} over Notion limits)  after={after:5d} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import tempfile
+import time
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openapi_parser import OpenAPIParser  # noqa: E402
+from synthetic_spec import generate_spec  # noqa: E402
+
+
+class SlowReadParser(OpenAPIParser):
+    # ネットワークファイルシステムのように、ファイルを読むたびに待ち時間が入る場合を再現する
+    read_latency = 0.0
+
+    @classmethod
+    def _read_file(cls, path):
+        time.sleep(cls.read_latency)
+        return OpenAPIParser._read_file(path)
+
+
+def write_split_spec(spec, directory, files):
+    # components/schemasをfiles個のファイルに分け、$refをファイルへの参照に書き換える
+    schemas = spec['components']['schemas']
+    names = list(schemas)
+    file_of = {name: f"models{index % files}.yaml" for index, name in enumerate(names)}
+
+    def rewrite(obj, local_file):
+        if isinstance(obj, dict):
+            ref = obj.get('$ref')
+            if isinstance(ref, str) and ref.startswith('#/components/schemas/'):
+                name = ref.rsplit('/', 1)[-1]
+                target = file_of[name]
+                if local_file is None:
+                    obj['$ref'] = f"./schemas/{target}#/{name}"
+                elif target == local_file:
+                    obj['$ref'] = f"#/{name}"
+                else:
+                    obj['$ref'] = f"./{target}#/{name}"
+            for value in obj.values():
+                rewrite(value, local_file)
+        elif isinstance(obj, list):
+            for value in obj:
+                rewrite(value, local_file)
+
+    os.makedirs(os.path.join(directory, 'schemas'), exist_ok=True)
+    for index in range(files):
+        file_name = f"models{index}.yaml"
+        part = {name: schemas[name] for name in names if file_of[name] == file_name}
+        rewrite(part, file_name)
+        with open(os.path.join(directory, 'schemas', file_name), 'w', encoding='utf-8') as file:
+            yaml.safe_dump(part, file)
+
+    root = {key: value for key, value in spec.items() if key != 'components'}
+    rewrite(root, None)
+    root_path = os.path.join(directory, 'openapi.yaml')
+    with open(root_path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump(root, file)
+    return root_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure loading a specification split into many files')
+    parser.add_argument('--endpoints', type=int, default=500)
+    parser.add_argument('--schemas', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--read-latency', type=float, default=0.0, help='Seconds to wait on every file read')
+    args = parser.parse_args()
+
+    SlowReadParser.read_latency = args.read_latency
+    spec = generate_spec(endpoints=args.endpoints, schemas=args.schemas)
+    with tempfile.TemporaryDirectory() as tmp:
+        root_path = write_split_spec(spec, tmp, args.files)
+        sizes = [os.path.getsize(os.path.join(tmp, 'schemas', name)) for name in os.listdir(os.path.join(tmp, 'schemas'))]
+        print(f"{args.files} schema files ({sum(sizes) / 1e6:.1f} MB, largest {max(sizes) / 1e3:.0f} KB) plus the root file")
+        for workers in args.workers:
+            started = time.perf_counter()
+            openapi_parser = SlowReadParser(root_path, max_workers=workers)
+            endpoints = openapi_parser.get_endpoints()
+            for endpoint in endpoints:
+                # 外部参照の解決まで含めて測る
+                endpoint['responses']['200']
+            print(f"workers={workers:3d}  load {openapi_parser.load_time:6.2f}s  total {time.perf_counter() - started:6.2f}s  "
+                  f"({len(openapi_parser.documents)} documents, {len(endpoints)} endpoints)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any
+import itertools
+import json
+import random
+import threading
+import time
+
+
+class FakeNotionServer:
+    # ベンチマーク用にNotion APIの代わりをするローカルのHTTPサーバー
+    # latency: 1リクエストごとの応答の遅延（秒）
+    # throttle_rate: 429（rate_limited）を返す確率
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 0.1, seed: int = 0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self.blocks_created = 0
+        self.bytes_received = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> 'FakeNotionServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeNotionServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'blocks_created': self.blocks_created,
+                'bytes_received': self.bytes_received
+            }
+
+    def _new_id(self) -> str:
+        return f"{next(self._ids):032x}"
+
+    def _handle(self, method: str, path: str, body: Dict[str, Any], size: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += size
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            return 429, {'object': 'error', 'status': 429, 'code': 'rate_limited', 'message': 'Rate limited'}
+
+        parts = path.strip('/').split('?')[0].split('/')
+        # /v1/blocks/{id}/children
+        if method == 'PATCH' and len(parts) == 4 and parts[1] == 'blocks' and parts[3] == 'children':
+            results = [{'object': 'block', 'id': self._new_id(), 'type': block.get('type')} for block in body.get('children', [])]
+            with self._lock:
+                self.blocks_created += self._count_blocks(body.get('children', []))
+            return 200, {'object': 'list', 'results': results, 'next_cursor': None, 'has_more': False}
+        if method == 'GET' and len(parts) == 4 and parts[1] == 'blocks' and parts[3] == 'children':
+            return 200, {'object': 'list', 'results': [], 'next_cursor': None, 'has_more': False}
+        if method == 'DELETE' and len(parts) == 3 and parts[1] == 'blocks':
+            return 200, {'object': 'block', 'id': parts[2], 'archived': True}
+        if method == 'GET' and len(parts) == 3 and parts[1] == 'pages':
+            return 200, {'object': 'page', 'id': parts[2], 'properties': {'title': {'title': [{'plain_text': 'Benchmark'}]}}}
+        if method == 'POST' and len(parts) == 2 and parts[1] in ('pages', 'databases'):
+            with self._lock:
+                self.blocks_created += self._count_blocks(body.get('children') or [])
+            return 200, {'object': parts[1][:-1], 'id': self._new_id()}
+        return 404, {'object': 'error', 'status': 404, 'code': 'object_not_found', 'message': f"{method} {path}"}
+
+    def _count_blocks(self, blocks) -> int:
+        total = 0
+        for block in blocks:
+            total += 1
+            content = block.get(block.get('type'))
+            if isinstance(content, dict) and content.get('children'):
+                total += self._count_blocks(content['children'])
+        return total
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                data = self.rfile.read(length) if length else b''
+                body = json.loads(data) if data else {}
+                status, payload = server._handle(self.command, self.path, body, length)
+                encoded = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                if status == 429:
+                    self.send_header('Retry-After', str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _respond
+
+        return Handler
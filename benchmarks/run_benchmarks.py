@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notion_api_client import NotionAPIClient  # noqa: E402
+from openapi_parser import OpenAPIParser, __version__  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from request_planner import count_blocks  # noqa: E402
+from fake_notion_server import FakeNotionServer  # noqa: E402
+from synthetic_spec import generate_spec  # noqa: E402
+
+
+def best_of(repeat, func):
+    # 最も速かった回の時間と、その回の戻り値を返す
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def resolve_all(endpoints):
+    for endpoint in endpoints:
+        endpoint['parameters'], endpoint['request_body']
+        for status_code in endpoint['responses']:
+            endpoint['responses'][status_code]
+    return endpoints
+
+
+def render_all(endpoints, toggle_mode):
+    # レンダリングキャッシュの効果も含めて測るため、毎回新しいクライアントを使う
+    client = NotionAPIClient(token='benchmark')
+    return [block for blocks in client.iter_endpoint_blocks(endpoints, toggle_mode=toggle_mode) for block in blocks]
+
+
+def bench_upload(endpoints, args):
+    with FakeNotionServer(latency=args.latency, throttle_rate=args.throttle_rate, retry_after=args.retry_after) as server:
+        limiter = RateLimiter(rate=args.rate, burst=args.burst, base_backoff=0.05)
+        client = NotionAPIClient(token='benchmark', base_url=server.base_url, rate_limiter=limiter)
+        started = time.perf_counter()
+        # 進捗やサマリーの出力がJSONに混ざらないようにする
+        with contextlib.redirect_stdout(sys.stderr):
+            client.create_endpoint_documentation(
+                'b' * 32, endpoints,
+                toggle_mode=args.toggle_mode,
+                concurrency=args.concurrency,
+                layout=args.layout
+            )
+        elapsed = time.perf_counter() - started
+        stats = server.stats()
+    return {
+        'seconds': elapsed,
+        'blocks_per_second': stats['blocks_created'] / elapsed if elapsed > 0 else 0.0,
+        'retries': limiter.retry_count,
+        'throttles': limiter.throttle_count,
+        **stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing, rendering and uploading a synthetic OpenAPI spec')
+    parser.add_argument('--endpoints', type=int, default=1000)
+    parser.add_argument('--schemas', type=int, default=200)
+    parser.add_argument('--properties', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=2, help='Depth of inline nested objects in each model')
+    parser.add_argument('--fan-out', type=int, default=2, help='Shared models referenced by each model')
+    parser.add_argument('--format', choices=['json', 'yaml'], default='yaml')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated Notion API latency in seconds')
+    parser.add_argument('--throttle-rate', type=float, default=0.02, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=0.1)
+    parser.add_argument('--rate', type=float, default=100.0, help='Client rate limit in requests per second')
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--toggle-mode', action='store_true')
+    parser.add_argument('--layout', choices=['single', 'tag-pages', 'database'], default='single')
+    parser.add_argument('--skip-upload', action='store_true')
+    parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    spec = generate_spec(endpoints=args.endpoints, schemas=args.schemas, properties=args.properties,
+                         depth=args.depth, fan_out=args.fan_out)
+    results = {
+        'version': __version__,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': vars(args),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = os.path.join(tmp, f"spec.{args.format}")
+        with open(spec_path, 'w', encoding='utf-8') as file:
+            if args.format == 'json':
+                json.dump(spec, file)
+            else:
+                yaml.dump(spec, file, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper), sort_keys=False)
+        results['spec_bytes'] = os.path.getsize(spec_path)
+
+        load_seconds, openapi_parser = best_of(args.repeat, lambda: OpenAPIParser(spec_path))
+        results['load'] = {'seconds': load_seconds, 'format': openapi_parser.load_format}
+
+        # 解決済みの参照はパーサーごとに保持されるので、毎回新しいパーサーで測る
+        parsers = [OpenAPIParser(spec_path) for _ in range(args.repeat)]
+        # エンドポイントのスキーマはアクセスされたときに解決されるので、全て解決するまでを測る（以前の版と同じ範囲）
+        parse_seconds, endpoints = best_of(args.repeat, lambda: resolve_all(parsers.pop().get_endpoints()))
+        results['get_endpoints'] = {'seconds': parse_seconds, 'endpoints': len(endpoints)}
+
+    results['render'] = {}
+    for toggle_mode in (False, True):
+        seconds, blocks = best_of(args.repeat, lambda: render_all(endpoints, toggle_mode))
+        total = count_blocks(blocks)
+        results['render']['toggle' if toggle_mode else 'flat'] = {
+            'seconds': seconds,
+            'blocks': total,
+            'blocks_per_second': total / seconds if seconds > 0 else 0.0
+        }
+
+    if not args.skip_upload:
+        results['upload'] = bench_upload(endpoints, args)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+from typing import Dict, Any
+import random
+
+METHODS = ['get', 'post', 'put', 'patch', 'delete']
+
+
+def generate_spec(endpoints: int = 1000, schemas: int = 200, properties: int = 8, ref_probability: float = 0.15,
+                  depth: int = 0, fan_out: int = 0, seed: int = 0) -> Dict[str, Any]:
+    # ベンチマーク用の合成OpenAPI仕様を生成する
+    # depth: 各モデルに埋め込むインラインのネストしたオブジェクトの深さ
+    # fan_out: 各モデルが参照する共有モデルの数（ランダムな参照とは別）
+    rng = random.Random(seed)
+    schema_names = [f"Model{i}" for i in range(schemas)]
+
+    components = {}
+    for index, name in enumerate(schema_names):
+        props = {}
+        for p in range(properties):
+            kind = rng.random()
+            if kind < ref_probability and index + 1 < schemas:
+                # 後ろのモデルだけを参照して循環しないようにする
+                target = schema_names[rng.randrange(index + 1, schemas)]
+                props[f"field{p}"] = {'$ref': f"#/components/schemas/{target}"}
+            elif kind < ref_probability + 0.1:
+                props[f"field{p}"] = {'type': 'array', 'items': {'type': 'string'}}
+            elif kind < ref_probability + 0.2:
+                props[f"field{p}"] = {'type': 'string', 'enum': ['a', 'b', 'c']}
+            else:
+                props[f"field{p}"] = {'type': rng.choice(['string', 'integer', 'number', 'boolean']),
+                                      'description': f"Field {p} of {name}"}
+        for k in range(fan_out):
+            # 末尾のfan_out個のモデルを共有モデルとして全モデルから参照する（後ろだけを参照するので循環しない）
+            target = schemas - 1 - k
+            if target > index:
+                props[f"ref{k}"] = {'$ref': f"#/components/schemas/{schema_names[target]}"}
+        if depth > 0:
+            props['nested'] = nested_object(depth, name)
+        components[name] = {
+            'type': 'object',
+            'required': [f"field{p}" for p in range(0, properties, 2)],
+            'properties': props
+        }
+    components['Error'] = {
+        'type': 'object',
+        'required': ['code', 'message'],
+        'properties': {'code': {'type': 'integer'}, 'message': {'type': 'string'}}
+    }
+
+    paths = {}
+    for i in range(endpoints):
+        method = METHODS[i % len(METHODS)]
+        path = f"/resources{i // len(METHODS)}/{{id}}"
+        model = schema_names[rng.randrange(schemas)] if schemas else 'Error'
+        operation = {
+            'summary': f"Operation {i}",
+            'description': f"Synthetic operation {i} for benchmarking.",
+            'operationId': f"operation{i}",
+            'tags': [f"tag{i % 20}"],
+            'parameters': [
+                {'name': 'id', 'in': 'path', 'required': True, 'schema': {'type': 'string'}},
+                {'name': 'limit', 'in': 'query', 'schema': {'type': 'integer'}}
+            ],
+            'responses': {
+                '200': {
+                    'description': 'OK',
+                    'content': {'application/json': {'schema': {'$ref': f"#/components/schemas/{model}"}}}
+                },
+                '404': {
+                    'description': 'Not found',
+                    'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Error'}}}
+                }
+            }
+        }
+        if method in ('post', 'put', 'patch'):
+            operation['requestBody'] = {
+                'required': True,
+                'content': {'application/json': {'schema': {'$ref': f"#/components/schemas/{model}"}}}
+            }
+        paths.setdefault(path, {})[method] = operation
+
+    return {
+        'openapi': '3.0.3',
+        'info': {'title': 'Synthetic API', 'version': '1.0.0'},
+        'paths': paths,
+        'components': {'schemas': components}
+    }
+
+
+def nested_object(depth: int, name: str) -> Dict[str, Any]:
+    # 指定した深さまでインラインのオブジェクトを入れ子にする
+    schema = {'type': 'object', 'properties': {'value': {'type': 'string', 'description': f"Leaf of {name}"}}}
+    for level in range(depth - 1, 0, -1):
+        schema = {
+            'type': 'object',
+            'required': ['child'],
+            'properties': {'level': {'type': 'integer', 'enum': [level]}, 'child': schema}
+        }
+    return schema
@@ -0,0 +1,337 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from collections import deque
+from typing import Dict, List, Any, Callable
+import threading
+import time
+from notion_client.errors import HTTPResponseError
+from checkpoint_journal import CheckpointJournal
+from metrics import Metrics
+from request_planner import RequestPlanner, PlannedRequest, count_blocks
+
+
+class BlockUploader:
+    # 1リクエストの上限（詳しくはRequestPlannerを参照）
+    max_blocks_per_request = 100
+    max_nested_blocks_per_request = 1000
+    max_request_bytes = 480_000
+
+    def __init__(self, client, rate_limiter, concurrency: int = 1, progress=None, journal: CheckpointJournal = None, metrics: Metrics = None):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics or Metrics()
+        self.concurrency = max(1, concurrency)
+        self.progress = progress
+        # ジャーナルがあれば、前回までに追加済みのリクエストはスキップする
+        self.journal = journal
+        self.blocks_uploaded = 0
+        self.blocks_skipped = 0
+        self.requests_sent = 0
+        self._chunk_sequence: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._finished_at = None
+        self._futures = set()
+        self._error = None
+        # 未完了のタスク数を制限して、待機中のブロックがメモリに溜まり続けないようにする
+        self._slots = threading.BoundedSemaphore(self.concurrency * 4)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency) if self.concurrency > 1 else None
+
+    def append(self, parent_id: str, blocks: List[Dict[str, Any]], after: str = None) -> List[str]:
+        # 同じ親への追加は常に順番に送信してブロックの順序を保つ
+        # afterを指定した場合は、そのブロックの直後から順に挿入する
+        block_ids = []
+        for request in self.planner().plan(blocks):
+            request_ids = self.send(parent_id, request, after)
+            if after is not None and request_ids:
+                after = request_ids[-1]
+            block_ids.extend(request_ids)
+        return block_ids
+
+    def send(self, parent_id: str, request: PlannedRequest, after: str = None) -> List[str]:
+        block_ids = self._append_chunk(parent_id, request, after)
+        # 1リクエストに収まらなかった子ブロックは、作成されたブロックに続けて追加する
+        for index, remainder in request.deferred:
+            self.append(block_ids[index], remainder)
+        # 切り離した子ブロックは、作成されたブロックごとにワーカーで並行して追加する
+        for index, children in request.detached:
+            self.submit(block_ids[index], children)
+        return block_ids
+
+    def planner(self, detach_children: bool = False) -> RequestPlanner:
+        return RequestPlanner(
+            max_blocks=self.max_blocks_per_request,
+            max_nested_blocks=self.max_nested_blocks_per_request,
+            max_bytes=self.max_request_bytes,
+            detach_children=detach_children
+        )
+
+    def submit(self, parent_id: str, blocks: List[Dict[str, Any]]) -> None:
+        # 独立した親（別のトグルやページ）への追加はワーカーで並行して処理する
+        self._submit(self.append, parent_id, blocks)
+
+    def create_page(self, parent_id: str, title: str) -> str:
+        if self.journal is not None:
+            key = f"{parent_id}/page:{title}"
+            digest = CheckpointJournal.digest([{'title': title}])
+            page_ids = self.journal.lookup(key, digest)
+            if page_ids is not None:
+                return page_ids[0]
+
+        response = self.rate_limiter.call(
+            self.metrics.timed('pages.create', self.client.pages.create),
+            parent={'page_id': parent_id},
+            properties={'title': {'title': [{'type': 'text', 'text': {'content': title}}]}}
+        )
+        with self._lock:
+            self.requests_sent += 1
+        self.metrics.increment('requests_sent')
+
+        if self.journal is not None:
+            self.journal.record(key, digest, [response['id']])
+        return response['id']
+
+    def create_database(self, parent_id: str, title: str, properties: Dict[str, Any]) -> str:
+        if self.journal is not None:
+            key = f"{parent_id}/database:{title}"
+            digest = CheckpointJournal.digest([{'title': title, 'properties': properties}])
+            database_ids = self.journal.lookup(key, digest)
+            if database_ids is not None:
+                return database_ids[0]
+
+        response = self.rate_limiter.call(
+            self.metrics.timed('databases.create', self.client.databases.create),
+            parent={'type': 'page_id', 'page_id': parent_id},
+            title=[{'type': 'text', 'text': {'content': title}}],
+            properties=properties
+        )
+        with self._lock:
+            self.requests_sent += 1
+        self.metrics.increment('requests_sent')
+
+        if self.journal is not None:
+            self.journal.record(key, digest, [response['id']])
+        return response['id']
+
+    def submit_row(self, database_id: str, key: str, properties: Dict[str, Any], blocks: List[Any]) -> None:
+        # データベースの行はそれぞれ独立しているので、ワーカーで並行して作成する
+        self._submit(self.create_row, database_id, key, properties, blocks)
+
+    def create_row(self, database_id: str, key: str, properties: Dict[str, Any], blocks: List[Any]) -> str:
+        # 最初のリクエスト分のブロックは行（ページ）の作成と同じリクエストで送る
+        # 子ブロックが後に回されるリクエストは、作成されたブロックのIDが必要なので行の作成後に追加する
+        requests = self.planner().plan(blocks)
+        first = requests[0] if requests and not requests[0].deferred else None
+        children = first.payload if first is not None else []
+
+        page_id = None
+        if self.journal is not None:
+            journal_key = f"{database_id}/row:{key}"
+            digest = CheckpointJournal.digest([properties] + children)
+            page_ids = self.journal.lookup(journal_key, digest)
+            if page_ids is not None:
+                page_id = page_ids[0]
+                if first is not None:
+                    skipped = count_blocks(first.blocks)
+                    with self._lock:
+                        self.blocks_skipped += skipped
+                    if self.progress is not None:
+                        self.progress.update(skipped)
+                    self.metrics.increment('blocks_skipped', skipped)
+
+        if page_id is None:
+            with self._lock:
+                if self._started_at is None:
+                    self._started_at = time.monotonic()
+            response = self.rate_limiter.call(
+                self.metrics.timed('pages.create', self.client.pages.create),
+                parent={'database_id': database_id},
+                properties=properties,
+                children=children
+            )
+            page_id = response['id']
+            uploaded = count_blocks(first.blocks) if first is not None else 0
+            with self._lock:
+                self.requests_sent += 1
+                self.blocks_uploaded += uploaded
+                self._finished_at = time.monotonic()
+            if self.progress is not None and uploaded:
+                self.progress.update(uploaded)
+            self.metrics.increment('requests_sent')
+            self.metrics.increment('blocks_uploaded', uploaded)
+            if first is not None:
+                self.metrics.increment('bytes_sent', first.size)
+            if self.journal is not None:
+                self.journal.record(journal_key, digest, [page_id])
+
+        for request in requests[1:] if first is not None else requests:
+            self.send(page_id, request)
+        return page_id
+
+    def delete(self, block_ids: List[str]) -> None:
+        # ブロックの削除（アーカイブ）は互いに独立しているので並行して処理する
+        for block_id in block_ids:
+            self._submit(self._delete_block, block_id)
+
+    def wait(self) -> None:
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        self._raise_if_failed()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    @property
+    def elapsed(self) -> float:
+        if self._started_at is None:
+            return 0.0
+        return (self._finished_at or time.monotonic()) - self._started_at
+
+    @property
+    def blocks_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.blocks_uploaded / elapsed if elapsed > 0 else 0.0
+
+    def _submit(self, func: Callable[..., Any], *args) -> None:
+        if self._executor is None:
+            func(*args)
+            return
+        self._raise_if_failed()
+        self._slots.acquire()
+        future = self._executor.submit(func, *args)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._task_done)
+
+    def _task_done(self, future: Future) -> None:
+        self._slots.release()
+        with self._lock:
+            self._futures.discard(future)
+            if self._error is None and not future.cancelled() and future.exception() is not None:
+                self._error = future.exception()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _append_chunk(self, parent_id: str, request: PlannedRequest, after: str = None) -> List[str]:
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            # 親ごとのリクエスト番号（同じ親への追加は常に順番に行われる）
+            sequence = self._chunk_sequence.get(parent_id, 0)
+            self._chunk_sequence[parent_id] = sequence + 1
+
+        # Notion APIのJSONには、RequestPlannerが大きさを測るときに展開したものをそのまま使う
+        chunk, children = request.blocks, request.payload
+        if self.journal is not None:
+            key = f"{parent_id}/{sequence}"
+            digest = CheckpointJournal.digest(children)
+            block_ids = self.journal.lookup(key, digest)
+            if block_ids is not None:
+                skipped = count_blocks(chunk)
+                with self._lock:
+                    self.blocks_skipped += skipped
+                    if self.progress is not None:
+                        self.progress.update(skipped)
+                self.metrics.increment('blocks_skipped', skipped)
+                return block_ids
+
+        kwargs = {'after': after} if after is not None else {}
+        try:
+            response = self.rate_limiter.call(
+                self.metrics.timed('blocks.children.append', self.client.blocks.children.append),
+                block_id=parent_id,
+                children=children,
+                **kwargs
+            )
+        except Exception as e:
+            print(f"\nFailed to upload {len(chunk)} blocks to {parent_id}: {e}")
+            raise
+
+        uploaded = count_blocks(chunk)
+        with self._lock:
+            self.requests_sent += 1
+            self.blocks_uploaded += uploaded
+            self._finished_at = time.monotonic()
+            if self.progress is not None:
+                self.progress.update(uploaded)
+        self.metrics.increment('requests_sent')
+        self.metrics.increment('blocks_uploaded', uploaded)
+        # リクエストに含めたブロックのJSONのバイト数
+        self.metrics.increment('bytes_sent', request.size)
+
+        block_ids = [block['id'] for block in response.get('results', [])]
+        if self.journal is not None:
+            self.journal.record(key, digest, block_ids)
+        return block_ids
+
+    def _delete_block(self, block_id: str) -> None:
+        try:
+            self.rate_limiter.call(self.metrics.timed('blocks.delete', self.client.blocks.delete), block_id=block_id)
+        except HTTPResponseError as e:
+            # 既に削除・アーカイブ済みのブロックは無視する
+            if e.status not in (400, 404):
+                raise
+        with self._lock:
+            self.requests_sent += 1
+        self.metrics.increment('requests_sent')
+
+
+class BlockStream:
+    # 受け取ったブロックを1リクエスト分に詰め、いっぱいになるたびにアップロードする
+    # 書き込みは専用のスレッドで順番に行うので、その間も呼び出し側はレンダリングを続けられる
+    def __init__(self, uploader: BlockUploader, parent_id: str, after: str = None, max_pending_requests: int = 2):
+        self.uploader = uploader
+        self.parent_id = parent_id
+        self.after = after
+        self.block_ids: List[str] = []
+        self.max_pending_requests = max_pending_requests
+        # 並行アップロード時は1リクエストに収まらないトグルの中身を切り離し、トグルごとに並行して追加する
+        self._planner = uploader.planner(detach_children=uploader.concurrency > 1)
+        self._pending = deque()
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        # 最初に失敗した書き込みのエラー。以降のリクエストは送らない（送るとページ上の順序が崩れ、再開時に重複する）
+        self._error = None
+
+    def add(self, blocks: List[Dict[str, Any]]) -> None:
+        if self._error is not None:
+            raise self._error
+        for block in blocks:
+            request = self._planner.add(block)
+            if request is not None:
+                self._flush(request)
+
+    def close(self) -> List[str]:
+        try:
+            request = self._planner.finish()
+            if request is not None:
+                self._flush(request)
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._writer.shutdown(wait=True)
+        self.uploader.wait()
+        return self.block_ids
+
+    def cancel(self) -> None:
+        # 送信待ちのリクエストを取り消して書き込み用のスレッドを止める（close()の後に呼んでもよい）
+        self._writer.shutdown(wait=True, cancel_futures=True)
+
+    def _flush(self, request: PlannedRequest) -> None:
+        while self._pending and (len(self._pending) >= self.max_pending_requests or self._pending[0].done()):
+            self._pending.popleft().result()
+        self._pending.append(self._writer.submit(self._write, request))
+
+    def _write(self, request: PlannedRequest) -> None:
+        if self._error is not None:
+            return
+        try:
+            block_ids = self.uploader.send(self.parent_id, request, self.after)
+        except BaseException as e:
+            self._error = e
+            raise
+        if self.after is not None and block_ids:
+            self.after = block_ids[-1]
+        self.block_ids.extend(block_ids)
@@ -0,0 +1,111 @@
+from typing import Dict, List, Any, Union
+
+# rich_textの1要素のテキストはNotionの数え方（UTF-16）で最大2000文字、1つのrich_textは最大100要素
+MAX_RICH_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+
+
+class Block:
+    # レンダリング結果を保持するコンパクトなブロック
+    # Notion APIのJSON（入れ子の辞書）はリクエストを組み立てる直前にだけ展開する
+    __slots__ = ('kind', 'text', 'annotation', 'language', 'children')
+
+    def __init__(self, kind: str, text: str = None, annotation: str = None, language: str = None, children: List['Block'] = None):
+        self.kind = kind
+        self.text = text
+        # 'bold' / 'italic' などのテキストの装飾（1つだけ）
+        self.annotation = annotation
+        self.language = language
+        self.children = children
+
+    def to_notion(self) -> Dict[str, Any]:
+        content = {}
+        if self.text is not None:
+            # 長いテキストは複数の要素に分けて送る（表示は1つの続いたテキストになる）
+            content["rich_text"] = [self._rich_text(segment) for segment in split_rich_text(self.text)]
+        if self.language is not None:
+            content["language"] = self.language
+        if self.children:
+            content["children"] = [to_notion(child) for child in self.children]
+        return {"type": self.kind, self.kind: content}
+
+    def _rich_text(self, content: str) -> Dict[str, Any]:
+        rich_text = {"type": "text", "text": {"content": content}}
+        if self.annotation:
+            rich_text["annotations"] = {self.annotation: True}
+        return rich_text
+
+    def without_children(self) -> 'Block':
+        return Block(self.kind, self.text, self.annotation, self.language)
+
+    def with_children(self, children: List['Block']) -> 'Block':
+        return Block(self.kind, self.text, self.annotation, self.language, children)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Block):
+            return NotImplemented
+        return (self.kind, self.text, self.annotation, self.language, self.children) == \
+            (other.kind, other.text, other.annotation, other.language, other.children)
+
+    def __repr__(self) -> str:
+        return f"Block({self.kind!r}, {self.text!r})"
+
+
+# ブロックは Block と、そのまま送るNotion APIの辞書（メンションなど）のどちらでもよい
+AnyBlock = Union[Block, Dict[str, Any]]
+
+
+def heading_2(text: str) -> Block:
+    return Block("heading_2", text)
+
+
+def heading_3(text: str) -> Block:
+    return Block("heading_3", text)
+
+
+def paragraph(text: str, annotation: str = None) -> Block:
+    return Block("paragraph", text, annotation)
+
+
+def code(text: str, language: str) -> Block:
+    return Block("code", text, language=language)
+
+
+def toggle(text: str, children: List[Block]) -> Block:
+    return Block("toggle", text, children=children)
+
+
+def divider() -> Block:
+    return Block("divider")
+
+
+def to_notion(block: AnyBlock) -> Dict[str, Any]:
+    return block.to_notion() if isinstance(block, Block) else block
+
+
+def to_notion_blocks(blocks: List[AnyBlock]) -> List[Dict[str, Any]]:
+    return [to_notion(block) for block in blocks]
+
+
+def text_length(text: str) -> int:
+    # Notionは文字数をUTF-16で数えるので、絵文字などは2文字になる
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le')) // 2
+
+
+def split_rich_text(text: str, limit: int = MAX_RICH_TEXT_LENGTH) -> List[str]:
+    if len(text) <= limit // 2 or text_length(text) <= limit:
+        return [text]
+    segments = []
+    start = 0
+    while start < len(text):
+        segment = text[start:start + limit]
+        excess = text_length(segment) - limit
+        while excess > 0:
+            # 1文字は1〜2単位なので、超えた分の半分ずつ削っていけば削りすぎない
+            segment = segment[:len(segment) - (excess + 1) // 2]
+            excess = text_length(segment) - limit
+        segments.append(segment)
+        start += len(segment)
+    return segments
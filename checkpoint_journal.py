@@ -0,0 +1,64 @@
+from typing import Dict, List, Any
+import hashlib
+import json
+import os
+import threading
+
+
+class CheckpointJournal:
+    # アップロードに成功したリクエストごとに、返ってきたブロックIDをJSONLで追記していく
+    def __init__(self, path: str, page_id: str, resume: bool = False):
+        self.path = path
+        self.page_id = page_id
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write({'page_id': page_id})
+
+    def _load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 書き込み途中で中断された最後の行は無視する
+                    break
+                if line_number == 1:
+                    if record.get('page_id') != self.page_id:
+                        raise ValueError(f"Checkpoint journal {self.path} belongs to page {record.get('page_id')}, not {self.page_id}")
+                    continue
+                self.entries[record['key']] = record
+
+    def lookup(self, key: str, digest: str) -> List[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry['digest'] != digest:
+            raise ValueError(f"Content for {key} changed since the interrupted upload; run again without --resume")
+        return entry['block_ids']
+
+    def record(self, key: str, digest: str, block_ids: List[str]) -> None:
+        record = {'key': key, 'digest': digest, 'block_ids': block_ids}
+        with self._lock:
+            self.entries[key] = record
+            self._write(record)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @staticmethod
+    def digest(blocks: List[Dict[str, Any]]) -> str:
+        payload = json.dumps(blocks, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
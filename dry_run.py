@@ -0,0 +1,186 @@
+from types import SimpleNamespace
+from typing import Dict, List, Any
+import itertools
+import json
+import os
+import threading
+
+
+class DryRunClient:
+    # notion_client.Client の代わりに使い、Notion APIを呼ばずにリクエストの内容をファイルに書き出す
+    # output_dir/requests.jsonl: 実際に送るはずのリクエスト（1行に1リクエスト）
+    # output_dir/preview.md: 作成されるページのMarkdownプレビュー
+    # output_dir/report.json: リクエスト数とブロック数の集計
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.requests: Dict[str, int] = {}
+        self.blocks_created = 0
+        self.bytes_sent = 0
+        self._ids = itertools.count(1)
+        # プレビュー用: 親ごとの子ブロックのIDの並びと、子ブロックを除いたブロックの内容
+        self._children: Dict[str, List[str]] = {}
+        self._blocks: Dict[str, Dict[str, Any]] = {}
+        self._page_titles: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._file = open(os.path.join(output_dir, 'requests.jsonl'), 'w', encoding='utf-8')
+
+        self.blocks = SimpleNamespace(
+            children=SimpleNamespace(append=self._append_children, list=self._list_children),
+            delete=self._delete_block
+        )
+        self.pages = SimpleNamespace(retrieve=self._retrieve_page, create=self._create_page)
+        self.databases = SimpleNamespace(create=self._create_database)
+
+    def close(self) -> Dict[str, Any]:
+        self._file.close()
+        with open(os.path.join(self.output_dir, 'preview.md'), 'w', encoding='utf-8') as file:
+            file.write(self.preview())
+        report = self.report()
+        with open(os.path.join(self.output_dir, 'report.json'), 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+            file.write('\n')
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': sum(self.requests.values()),
+                'requests_by_operation': dict(self.requests),
+                'blocks': self.blocks_created,
+                'bytes': self.bytes_sent
+            }
+
+    def preview(self) -> str:
+        # 既存のページ（作成したページ以外の親）から順に、作成した子ページはその後に出力する
+        with self._lock:
+            created = set(self._blocks) | set(self._page_titles)
+            roots = [parent_id for parent_id in self._children if parent_id not in created]
+            sections = []
+            for page_id in roots + list(self._page_titles):
+                title = self._page_titles.get(page_id, f"Page {page_id}")
+                lines = self._markdown_children(page_id, 0)
+                sections.append('\n'.join([f"# {title}", ''] + lines))
+        return '\n\n'.join(sections) + '\n'
+
+    def _record(self, operation: str, method: str, path: str, body: Dict[str, Any] = None) -> None:
+        line = json.dumps({'method': method, 'path': path, 'body': body}, ensure_ascii=False)
+        with self._lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+            if body is not None:
+                self.bytes_sent += len(json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            self._file.write(line + '\n')
+
+    def _new_id(self) -> str:
+        return f"00000000-0000-0000-0000-{next(self._ids):012x}"
+
+    def _append_children(self, block_id: str, children: List[Dict[str, Any]], after: str = None, **kwargs) -> Dict[str, Any]:
+        body = {'children': children}
+        if after is not None:
+            body['after'] = after
+        self._record('blocks.children.append', 'PATCH', f"/v1/blocks/{block_id}/children", body)
+        with self._lock:
+            ids = [self._store_block(block) for block in children]
+            siblings = self._children.setdefault(block_id, [])
+            position = siblings.index(after) + 1 if after in siblings else len(siblings)
+            siblings[position:position] = ids
+        return {'object': 'list', 'results': [{'object': 'block', 'id': new_id} for new_id in ids]}
+
+    def _store_block(self, block: Dict[str, Any]) -> str:
+        block_id = self._new_id()
+        content = dict(block[block['type']])
+        children = content.pop('children', None) or []
+        self._blocks[block_id] = {'type': block['type'], block['type']: content}
+        self.blocks_created += 1
+        self._children[block_id] = [self._store_block(child) for child in children]
+        return block_id
+
+    def _list_children(self, block_id: str, start_cursor: str = None, **kwargs) -> Dict[str, Any]:
+        self._record('blocks.children.list', 'GET', f"/v1/blocks/{block_id}/children")
+        with self._lock:
+            results = [{'object': 'block', 'id': child_id, **self._blocks[child_id]} for child_id in self._children.get(block_id, [])]
+        return {'object': 'list', 'results': results, 'next_cursor': None, 'has_more': False}
+
+    def _delete_block(self, block_id: str, **kwargs) -> Dict[str, Any]:
+        self._record('blocks.delete', 'DELETE', f"/v1/blocks/{block_id}")
+        with self._lock:
+            for siblings in self._children.values():
+                if block_id in siblings:
+                    siblings.remove(block_id)
+        return {'object': 'block', 'id': block_id, 'archived': True}
+
+    def _retrieve_page(self, page_id: str, **kwargs) -> Dict[str, Any]:
+        self._record('pages.retrieve', 'GET', f"/v1/pages/{page_id}")
+        return {'object': 'page', 'id': page_id, 'properties': {'title': {'title': [{'plain_text': 'Dry run'}]}}}
+
+    def _create_page(self, **body) -> Dict[str, Any]:
+        self._record('pages.create', 'POST', '/v1/pages', body)
+        page_id = self._new_id()
+        # 子ページはtitle、データベースの行はtitle型の列（Nameなど）がタイトルになる
+        title_property = next((value for value in body.get('properties', {}).values() if 'title' in value), {})
+        title = ''.join(item.get('text', {}).get('content', '') for item in title_property.get('title', []))
+        with self._lock:
+            self._page_titles[page_id] = title or 'Untitled'
+            children = body.get('children') or []
+            self._children[page_id] = [self._store_block(block) for block in children]
+        return {'object': 'page', 'id': page_id}
+
+    def _create_database(self, **body) -> Dict[str, Any]:
+        self._record('databases.create', 'POST', '/v1/databases', body)
+        return {'object': 'database', 'id': self._new_id()}
+
+    def _markdown_children(self, parent_id: str, depth: int) -> List[str]:
+        lines = []
+        for block_id in self._children.get(parent_id, []):
+            lines.extend(self._markdown_block(block_id, depth))
+        return lines
+
+    def _markdown_block(self, block_id: str, depth: int) -> List[str]:
+        block = self._blocks[block_id]
+        kind = block['type']
+        content = block[kind]
+        text = self._markdown_text(content.get('rich_text', []))
+        indent = '  ' * depth
+
+        if kind in ('heading_1', 'heading_2', 'heading_3'):
+            return [f"{'#' * (int(kind[-1]) + 1)} {text}", '']
+        if kind == 'paragraph':
+            return [indent + text, '']
+        if kind == 'code':
+            plain = ''.join(item.get('text', {}).get('content', '') for item in content.get('rich_text', []))
+            return [f"{indent}```{content.get('language', '')}"] + [indent + line for line in plain.split('\n')] + [f"{indent}```", '']
+        if kind == 'bulleted_list_item':
+            return [f"{indent}- {text}"] + self._markdown_children(block_id, depth + 1)
+        if kind == 'toggle':
+            return [f"{indent}<details><summary>{text}</summary>", ''] + self._markdown_children(block_id, depth) + [f"{indent}</details>", '']
+        if kind == 'divider':
+            return ['---', '']
+        return [f"{indent}<!-- {kind} -->", '']
+
+    def _markdown_text(self, rich_text: List[Dict[str, Any]]) -> str:
+        parts = []
+        for item in rich_text:
+            if item.get('type') == 'mention':
+                page_id = item['mention'].get('page', {}).get('id')
+                parts.append(f"[{self._page_titles.get(page_id, page_id)}]")
+                continue
+            content = item.get('text', {}).get('content', '')
+            annotations = item.get('annotations', {})
+            if annotations.get('bold'):
+                content = f"**{content}**"
+            if annotations.get('italic'):
+                content = f"*{content}*"
+            parts.append(content)
+        return ''.join(parts)
+
+
+class NoRateLimit:
+    # ドライランではNotion APIを呼ばないので待たずにそのまま呼び出す
+    retry_count = 0
+    throttle_count = 0
+
+    def acquire(self) -> None:
+        pass
+
+    def call(self, func, *args, **kwargs) -> Any:
+        return func(*args, **kwargs)
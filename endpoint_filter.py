@@ -0,0 +1,38 @@
+from fnmatch import fnmatchcase
+from typing import Dict, List, Any
+
+
+class EndpointFilter:
+    # 公開するオペレーションの条件
+    # 同じ種類の条件はどれか1つに一致すればよく、種類の違う条件は全て満たす必要がある
+    def __init__(self, tags: List[str] = None, path_globs: List[str] = None, operation_ids: List[str] = None, exclude_deprecated: bool = False):
+        self.tags = set(tags or [])
+        self.path_globs = list(path_globs or [])
+        self.operation_ids = set(operation_ids or [])
+        self.exclude_deprecated = exclude_deprecated
+
+    def __bool__(self) -> bool:
+        return bool(self.tags or self.path_globs or self.operation_ids or self.exclude_deprecated)
+
+    def matches(self, path: str, operation: Dict[str, Any]) -> bool:
+        if self.exclude_deprecated and operation.get('deprecated', False):
+            return False
+        if self.tags and not self.tags.intersection(operation.get('tags') or []):
+            return False
+        if self.operation_ids and operation.get('operationId') not in self.operation_ids:
+            return False
+        if self.path_globs and not any(fnmatchcase(path, pattern) for pattern in self.path_globs):
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        if self.tags:
+            parts.append(f"tags {', '.join(sorted(self.tags))}")
+        if self.path_globs:
+            parts.append(f"paths {', '.join(self.path_globs)}")
+        if self.operation_ids:
+            parts.append(f"operation IDs {', '.join(sorted(self.operation_ids))}")
+        if self.exclude_deprecated:
+            parts.append("excluding deprecated")
+        return '; '.join(parts)
@@ -1,8 +1,17 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import os
 import sys
-from openapi_parser import OpenAPIParser
+from openapi_parser import OpenAPIParser, __version__
+from spec_cache import SpecCache, default_cache_dir
 from notion_api_client import NotionAPIClient
+from async_notion_api_client import AsyncNotionAPIClient
+from metrics import Metrics
+from dry_run import DryRunClient, NoRateLimit
+from endpoint_filter import EndpointFilter
+from spec_watcher import SpecWatcher
+from preflight import PreflightError
 import logging
 
 
@@ -50,38 +59,275 @@ def main():
         action='store_true',
         help='Create endpoints inside toggle blocks for better organization'
     )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help='Number of concurrent upload workers for independent blocks such as toggle contents (default: 1)'
+    )
+    parser.add_argument(
+        '--layout',
+        choices=['single', 'tag-pages', 'database'],
+        default='single',
+        help='single: all endpoints on the target page; tag-pages: one child page per tag, populated concurrently; '
+             'database: a database with one row per endpoint, rows created concurrently (default: single)'
+    )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Only update endpoints that changed since the last sync, using a local manifest'
+    )
+    parser.add_argument(
+        '--manifest',
+        help='Path to the sync manifest file (default: .notion_sync/<page-id>.json)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume an interrupted upload, skipping requests recorded in the checkpoint journal'
+    )
+    parser.add_argument(
+        '--journal',
+        help='Path to the checkpoint journal (default: .notion_journal/<page-id>.jsonl)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=default_cache_dir(),
+        help='Directory for the parsed specification cache (default: ~/.cache/openapi-to-notion)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the parsed specification cache'
+    )
+    parser.add_argument(
+        '--metrics-out',
+        help='Write per-phase timings, Notion request latencies and counters to this file'
+    )
+    parser.add_argument(
+        '--metrics-format',
+        choices=['json', 'prometheus'],
+        default='json',
+        help='Format of the --metrics-out file (default: json)'
+    )
+    parser.add_argument(
+        '--tag',
+        action='append',
+        help='Only publish operations with this tag (repeatable)'
+    )
+    parser.add_argument(
+        '--path-glob',
+        action='append',
+        help='Only publish operations whose path matches this glob, e.g. "/users/*" (repeatable)'
+    )
+    parser.add_argument(
+        '--operation-id',
+        action='append',
+        help='Only publish the operation with this operationId (repeatable)'
+    )
+    parser.add_argument(
+        '--exclude-deprecated',
+        action='store_true',
+        help='Skip operations marked as deprecated'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Render everything but write the request payloads and a Markdown preview to --output-dir instead of calling Notion'
+    )
+    parser.add_argument(
+        '--output-dir',
+        help='Directory for --dry-run output (default: notion_dry_run); implies --dry-run'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Publish with the asyncio client over a pooled keep-alive connection (HTTP/2 when h2 is installed)'
+    )
+    parser.add_argument(
+        '--max-connections',
+        type=int,
+        default=10,
+        help='Size of the HTTP connection pool for --async (default: 10)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and republish changed endpoints whenever the specification or a file it references changes; implies --sync'
+    )
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=1.0,
+        help='Seconds between checks for changed files in --watch mode (default: 1.0)'
+    )
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=0.5,
+        help='Seconds the files must stay unchanged before --watch reloads them (default: 0.5)'
+    )
+    parser.add_argument(
+        '--preflight',
+        action='store_true',
+        help='Render and check every endpoint against Notion API limits before the first request, '
+             'so nothing is sent if a block cannot be fixed (delays the first request by a full render)'
+    )
     
     args = parser.parse_args()
+    if args.watch:
+        if args.dry_run or args.output_dir or args.use_async:
+            parser.error('--watch cannot be combined with --dry-run or --async')
+        args.sync = True
+    if args.sync and args.layout != 'single':
+        parser.error('--sync only supports --layout single')
+    if args.output_dir:
+        args.dry_run = True
+    if args.dry_run and (args.sync or args.resume):
+        parser.error('--dry-run cannot be combined with --sync or --resume')
+    if args.use_async and (args.sync or args.dry_run):
+        parser.error('--async cannot be combined with --sync or --dry-run')
     
+    metrics = Metrics()
+    notion_client = None
     try:
         logger.info(f"Loading OpenAPI specification from: {args.openapi}")
-        openapi_parser = OpenAPIParser(args.openapi)
-        endpoints = openapi_parser.get_endpoints()
-        logger.info(f"Found {len(endpoints)} endpoints")
+        cache = None if args.no_cache else SpecCache(args.cache_dir, __version__)
+        endpoint_filter = EndpointFilter(
+            tags=args.tag,
+            path_globs=args.path_glob,
+            operation_ids=args.operation_id,
+            exclude_deprecated=args.exclude_deprecated
+        )
+        if endpoint_filter:
+            logger.info(f"Selecting operations by {endpoint_filter.describe()}")
+        openapi_parser = OpenAPIParser(args.openapi, cache=cache, metrics=metrics, endpoint_filter=endpoint_filter)
+        logger.info(f"Loaded specification from {openapi_parser.load_format} in {openapi_parser.load_time:.2f}s")
+        logger.info(f"Found {openapi_parser.count_endpoints()} endpoints")
         
-        logger.info("Connecting to Notion API")
-        notion_client = NotionAPIClient(token=args.notion_token)
+        if args.dry_run:
+            output_dir = args.output_dir or 'notion_dry_run'
+            logger.info(f"Dry run: writing Notion requests to {output_dir}")
+            dry_run_client = DryRunClient(output_dir)
+            notion_client = NotionAPIClient(client=dry_run_client, rate_limiter=NoRateLimit(), metrics=metrics)
+        elif args.use_async:
+            logger.info(f"Connecting to Notion API (async, up to {args.max_connections} connections)")
+            notion_client = AsyncNotionAPIClient(token=args.notion_token, metrics=metrics, max_connections=args.max_connections)
+        else:
+            logger.info("Connecting to Notion API")
+            notion_client = NotionAPIClient(token=args.notion_token, metrics=metrics)
         
-        logger.info(f"Creating documentation in Notion page: {args.notion_page_id}")
-        notion_client.create_endpoint_documentation(
-            args.notion_page_id, 
-            endpoints,
-            include_errors=args.include_errors,
-            batch_size=args.batch_size,
-            toggle_mode=args.toggle_mode
-        )
+        with metrics.phase('publish'):
+            publish(args, notion_client, openapi_parser, logger)
+        
+        if args.watch:
+            watch(args, openapi_parser, notion_client, logger)
         
-        logger.info("Documentation created successfully!")
+        if args.dry_run:
+            report = dry_run_client.close()
+            logger.info(f"Dry run complete: a real run would send {report['requests']} requests with {report['blocks']} blocks "
+                        f"({report['bytes'] / 1e6:.1f} MB). See {output_dir}/preview.md")
+        else:
+            logger.info("Documentation created successfully!")
         
+    except KeyboardInterrupt:
+        logger.info("Stopped")
     except FileNotFoundError:
         logger.error(f"OpenAPI file not found: {args.openapi}")
         sys.exit(1)
+    except PreflightError as e:
+        logger.error(f"Stopped before sending blocks that exceed Notion API limits: {e}")
+        sys.exit(1)
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
         sys.exit(1)
     except Exception as e:
         logger.error(f"An error occurred: {e}")
         sys.exit(1)
+    finally:
+        # 失敗した場合も、どこで時間がかかったか分かるように途中までの計測結果を書き出す
+        if args.metrics_out:
+            if notion_client is not None:
+                metrics.increment('retries', notion_client.rate_limiter.retry_count)
+                metrics.increment('throttles', notion_client.rate_limiter.throttle_count)
+            metrics.write(args.metrics_out, args.metrics_format)
+            logger.info(f"Metrics written to {args.metrics_out}")
+
+
+def publish(args, notion_client, openapi_parser, logger):
+    # ブロックはレンダリングしながら制限と照らし合わせ、直せない問題があればそれを含むリクエストを送る前に止める
+    try:
+        _publish(args, notion_client, openapi_parser, logger)
+    except PreflightError as e:
+        for issue in e.issues:
+            logger.error(issue)
+        raise
+
+
+def _publish(args, notion_client, openapi_parser, logger):
+    if args.preflight:
+        # --preflight: 途中で止まらないように、送信を始める前に全てのブロックを制限と照らし合わせる
+        # エンドポイントは保持せず、チェックと公開でそれぞれ仕様から順に取り出す
+        notion_client.preflight(openapi_parser.iter_endpoints(), include_errors=args.include_errors, toggle_mode=args.toggle_mode)
+    # エンドポイントはパースしながら順にNotionへ送る
+    endpoints = openapi_parser.iter_endpoints()
+    if args.sync:
+        manifest_path = args.manifest or os.path.join('.notion_sync', f"{args.notion_page_id.replace('-', '')}.json")
+        logger.info(f"Syncing documentation in Notion page: {args.notion_page_id} (manifest: {manifest_path})")
+        notion_client.sync_endpoint_documentation(
+            args.notion_page_id,
+            endpoints,
+            manifest_path,
+            include_errors=args.include_errors,
+            toggle_mode=args.toggle_mode,
+            concurrency=args.concurrency
+        )
+    else:
+        journal_path = None if args.dry_run else args.journal or os.path.join('.notion_journal', f"{args.notion_page_id.replace('-', '')}.jsonl")
+        logger.info(f"Creating documentation in Notion page: {args.notion_page_id}")
+        documentation = notion_client.create_endpoint_documentation(
+            args.notion_page_id, 
+            endpoints,
+            include_errors=args.include_errors,
+            batch_size=args.batch_size,
+            toggle_mode=args.toggle_mode,
+            concurrency=args.concurrency,
+            journal_path=journal_path,
+            resume=args.resume,
+            layout=args.layout
+        )
+        if args.use_async:
+            asyncio.run(close_after(notion_client, documentation))
+
+
+def watch(args, openapi_parser, notion_client, logger):
+    # パーサー（前回のパース結果）とNotionクライアント（接続とレンダリングのキャッシュ）を使い回す
+    def load(previous):
+        reloaded = OpenAPIParser(
+            args.openapi,
+            # 編集のたびにディスクのキャッシュを書き込まない
+            cache=None,
+            metrics=previous.metrics,
+            endpoint_filter=previous.endpoint_filter,
+            previous=previous
+        )
+        logger.info(f"Reloaded specification from {reloaded.load_format} in {reloaded.load_time:.2f}s")
+        return reloaded
+
+    def republish(reloaded):
+        with reloaded.metrics.phase('publish'):
+            publish(args, notion_client, reloaded, logger)
+
+    watcher = SpecWatcher(load, republish, interval=args.watch_interval, debounce=args.debounce)
+    watcher.run(openapi_parser)
+
+
+async def close_after(notion_client, coroutine):
+    try:
+        await coroutine
+    finally:
+        await notion_client.aclose()
 
 
 if __name__ == "__main__":
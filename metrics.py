@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterator
+import json
+import os
+import threading
+import time
+
+# Notion APIのリクエスト時間のヒストグラムの区切り（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    # フェーズごとの所要時間、Notion APIのリクエスト時間、各種カウンターを集計する
+    # 複数のスレッドから同時に記録されるので、フェーズの時間は各スレッドの合計になる
+    def __init__(self, buckets: List[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.requests: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.perf_counter() - started)
+
+    def add_phase_time(self, name: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            phase = self.phases.setdefault(name, {'seconds': 0.0, 'count': 0})
+            phase['seconds'] += seconds
+            phase['count'] += count
+
+    def timed(self, operation: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        # Notion APIの呼び出しを包み、リトライを含めて1回ごとの時間を記録する
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe_request(operation, time.perf_counter() - started, failed)
+        return call
+
+    def timed_async(self, operation: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        # timedのasyncio版（待機中の他のリクエストの時間は含まれない）
+        async def call(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe_request(operation, time.perf_counter() - started, failed)
+        return call
+
+    def observe_request(self, operation: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            stats = self.requests.get(operation)
+            if stats is None:
+                stats = self.requests[operation] = {
+                    'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                    'buckets': [0] * len(self.buckets)
+                }
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if failed:
+                stats['errors'] += 1
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats['buckets'][index] += 1
+                    break
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = {}
+            for operation, stats in self.requests.items():
+                # ヒストグラムはPrometheusと同じく累積の件数で出力する
+                cumulative = []
+                total = 0
+                for bound, count in zip(self.buckets, stats['buckets']):
+                    total += count
+                    cumulative.append({'le': bound, 'count': total})
+                cumulative.append({'le': '+Inf', 'count': stats['count']})
+                requests[operation] = {
+                    'count': stats['count'],
+                    'errors': stats['errors'],
+                    'seconds': stats['seconds'],
+                    'mean_seconds': stats['seconds'] / stats['count'] if stats['count'] else 0.0,
+                    'max_seconds': stats['max_seconds'],
+                    'histogram': cumulative
+                }
+            report = {
+                'wall_seconds': time.perf_counter() - self._started_at,
+                'phases': {name: dict(phase) for name, phase in self.phases.items()},
+                'requests': requests,
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges)
+            }
+
+        publish = report['phases'].get('publish')
+        if publish and publish['seconds'] > 0:
+            report['blocks_per_second'] = report['counters'].get('blocks_uploaded', 0) / publish['seconds']
+        return report
+
+    def to_prometheus(self, prefix: str = 'openapi_to_notion') -> str:
+        report = self.report()
+        lines = [
+            f"# TYPE {prefix}_wall_seconds gauge",
+            f"{prefix}_wall_seconds {report['wall_seconds']}",
+            f"# TYPE {prefix}_phase_seconds gauge"
+        ]
+        for name, phase in report['phases'].items():
+            lines.append(f'{prefix}_phase_seconds{{phase="{name}"}} {phase["seconds"]}')
+
+        lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+        for operation, stats in report['requests'].items():
+            for bucket in stats['histogram']:
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{operation="{operation}",le="{bucket["le"]}"}} {bucket["count"]}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{operation="{operation}"}} {stats["seconds"]}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{operation="{operation}"}} {stats["count"]}')
+        lines.append(f"# TYPE {prefix}_request_errors_total counter")
+        for operation, stats in report['requests'].items():
+            lines.append(f'{prefix}_request_errors_total{{operation="{operation}"}} {stats["errors"]}')
+
+        for name, value in report['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in report['gauges'].items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        if 'blocks_per_second' in report:
+            lines.append(f"# TYPE {prefix}_blocks_per_second gauge")
+            lines.append(f"{prefix}_blocks_per_second {report['blocks_per_second']}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, format: str = 'json') -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            if format == 'prometheus':
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.report(), file, indent=2, ensure_ascii=False)
+                file.write('\n')
@@ -1,486 +1,262 @@
 from notion_client import Client
-from typing import Dict, List, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import Dict, List, Any, Union, Iterable, Iterator, Tuple
+import json
 import os
-import time
 from dotenv import load_dotenv
 from tqdm import tqdm
+from block_uploader import BlockUploader, BlockStream
+from request_planner import count_blocks
+from rate_limiter import RateLimiter
+from sync_manifest import SyncManifest
+from render_cache import RenderCache
+from checkpoint_journal import CheckpointJournal
+from metrics import Metrics
+from preflight import PreflightValidator, PreflightError
+from openapi_parser import ResolvedSchema
+from blocks import Block, heading_2, heading_3, paragraph, code, toggle, divider
 
 load_dotenv()
 
+# 見出しや注記などの固定のブロックは変更されないので、エンドポイントごとに作らずに共有する
+PARAMETERS_HEADING = heading_3("Parameters")
+REQUEST_BODY_HEADING = heading_3("Request Body")
+RESPONSES_HEADING = heading_3("Responses")
+PARAMETERS_TRUNCATED = paragraph("Parameters (truncated due to size):", "italic")
+SCHEMA_TRUNCATED = paragraph("Schema (truncated due to size):", "italic")
+DIVIDER = divider()
 
-class NotionAPIClient:
-    def __init__(self, token: str = None):
-        self.token = token or os.getenv('NOTION_TOKEN')
-        if not self.token:
-            raise ValueError("Notion token is required. Set NOTION_TOKEN environment variable or pass token parameter.")
-        self.client = Client(auth=self.token)
-    
-    def create_endpoint_documentation(self, page_id: str, endpoints: List[Dict[str, Any]], include_errors: bool = False, batch_size: int = 5, verify_page: bool = False, toggle_mode: bool = False) -> None:
-        # Normalize page ID format (add hyphens if needed)
-        page_id = self._normalize_page_id(page_id)
-        
-        # Optional page verification
-        if verify_page:
-            try:
-                page = self.client.pages.retrieve(page_id)
-                print(f"Successfully connected to page: {page.get('properties', {}).get('title', {}).get('title', [{}])[0].get('plain_text', 'Untitled')}")
-            except Exception as e:
-                print(f"Error accessing page {page_id}: {e}")
-                raise
-        else:
-            print(f"Connecting to Notion page: {page_id}")
-        
-        # Process endpoints in batches with progress bar
-        total_blocks = []
-        
-        with tqdm(total=len(endpoints), desc="Processing endpoints") as pbar:
-            for endpoint in endpoints:
-                if toggle_mode:
-                    # トグルモードの場合は各エンドポイントをトグルブロックで囲む
-                    toggle_blocks = self._create_toggle_endpoint(endpoint, include_errors)
-                    total_blocks.extend(toggle_blocks)
-                else:
-                    # 通常モード
-                    blocks = self._create_endpoint_blocks(endpoint, include_errors)
-                    total_blocks.extend(blocks)
-                pbar.update(1)
-        
-        # Append blocks in batches to avoid hitting API limits
-        print(f"\nUploading {len(total_blocks)} blocks to Notion...")
-        self._append_blocks_in_batches(page_id, total_blocks, batch_size)
-    
-    def _create_endpoint_blocks(self, endpoint: Dict[str, Any], include_errors: bool = False) -> List[Dict[str, Any]]:
-        blocks = []
-        
-        # エンドポイント名（H2見出し）
-        endpoint_title = f"{endpoint['method']} {endpoint['path']}"
-        
-        blocks.append({
+
+def dump_indented_json(value: Any, level: int = 0) -> str:
+    # 簡略化したスキーマ（文字列・リスト・辞書・True）用に、json.dumps(indent=2, ensure_ascii=False) と同じ文字列を組み立てる
+    # indent付きのjson.dumpsはC実装が使われず遅い。想定外の型の場合はjson.dumpsに任せる
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is True:
+        return 'true'
+    if isinstance(value, dict):
+        if not value:
+            return '{}'
+        if not all(isinstance(key, str) for key in value):
+            return _indent_json(value, level)
+        separator = '\n' + '  ' * (level + 1)
+        items = (f"{encode_basestring(key)}: {dump_indented_json(item, level + 1)}" for key, item in value.items())
+        return '{' + separator + (',' + separator).join(items) + '\n' + '  ' * level + '}'
+    if isinstance(value, list):
+        if not value:
+            return '[]'
+        separator = '\n' + '  ' * (level + 1)
+        items = (dump_indented_json(item, level + 1) for item in value)
+        return '[' + separator + (',' + separator).join(items) + '\n' + '  ' * level + ']'
+    return _indent_json(value, level)
+
+
+def _indent_json(value: Any, level: int) -> str:
+    return json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n' + '  ' * level)
+
+
+@lru_cache(maxsize=4096)
+def parameter_line(name: Any, value: str) -> str:
+    # パラメータの表の1行（同じパラメータは多くのエンドポイントで共有される）
+    key = name if isinstance(name, str) else json.dumps(name)
+    return f"  {encode_basestring(key)}: {encode_basestring(value)}"
+
+# --layout database で作成するデータベースの列
+ENDPOINT_DATABASE_PROPERTIES = {
+    'Name': {'title': {}},
+    'Method': {'select': {'options': [
+        {'name': method, 'color': color} for method, color in (
+            ('GET', 'blue'), ('POST', 'green'), ('PUT', 'orange'), ('PATCH', 'yellow'),
+            ('DELETE', 'red'), ('HEAD', 'gray'), ('OPTIONS', 'gray')
+        )
+    ]}},
+    'Path': {'rich_text': {}},
+    'Tags': {'multi_select': {}},
+    'Operation ID': {'rich_text': {}},
+    'Summary': {'rich_text': {}}
+}
+
+
+class EndpointRenderer:
+    # エンドポイントをNotionのブロックにレンダリングする（NotionAPIClientとAsyncNotionAPIClientで共通）
+    # Notion APIは呼ばないので、トークンなしでレンダリングだけに使える（バッチモードのワーカーなど）
+    def __init__(self, metrics: Metrics = None):
+        self.render_cache = RenderCache()
+        self._sections = [getattr(self, name) for name in self.endpoint_sections]
+        # レンダリングしたブロックはNotion APIの制限に合わせて直してから送る
+        self.validator = PreflightValidator()
+        self.metrics = metrics or Metrics()
+
+    def _create_endpoint_row_properties(self, endpoint: Dict[str, Any]) -> Dict[str, Any]:
+        def text(content: str) -> List[Dict[str, Any]]:
+            return [{'type': 'text', 'text': {'content': content[:2000]}}] if content else []
+
+        return {
+            'Name': {'title': text(f"{endpoint['method']} {endpoint['path']}")},
+            'Method': {'select': {'name': endpoint['method']}},
+            'Path': {'rich_text': text(endpoint['path'])},
+            # セレクトの選択肢にはカンマを使えず、100文字までしか付けられない
+            'Tags': {'multi_select': [{'name': tag.replace(',', ' ')[:100]} for tag in dict.fromkeys(endpoint['tags'])]},
+            'Operation ID': {'rich_text': text(endpoint['operation_id'])},
+            'Summary': {'rich_text': text(endpoint['summary'])}
+        }
+
+    def _create_tag_index_blocks(self, tags: List[str], page_ids: Dict[str, str], groups: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        blocks = [{
             "type": "heading_2",
             "heading_2": {
                 "rich_text": [{
                     "type": "text",
-                    "text": {"content": endpoint_title}
+                    "text": {"content": "Endpoints by tag"}
                 }]
             }
-        })
-        
-        # サマリー（通常のテキスト）
-        if endpoint['summary']:
-            blocks.append({
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": endpoint['summary']}
-                    }]
-                }
-            })
-        
-        # 説明
-        if endpoint['description']:
-            blocks.append({
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": endpoint['description']}
-                    }]
-                }
-            })
-        
-        # タグ
-        if endpoint['tags']:
+        }]
+        for tag in tags:
             blocks.append({
-                "type": "paragraph",
-                "paragraph": {
+                "type": "bulleted_list_item",
+                "bulleted_list_item": {
                     "rich_text": [{
+                        "type": "mention",
+                        "mention": {"type": "page", "page": {"id": page_ids[tag]}}
+                    }, {
                         "type": "text",
-                        "text": {"content": f"Tags: {', '.join(endpoint['tags'])}"},
-                        "annotations": {"italic": True}
+                        "text": {"content": f" ({len(groups[tag])} endpoints)"}
                     }]
                 }
             })
-        
-        # パラメータ
-        if endpoint['parameters']:
-            blocks.append({
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": "Parameters"}
-                    }]
-                }
-            })
-            
-            param_text = self._format_parameters(endpoint['parameters'])
-            if len(param_text) > 2000:
-                blocks.append({
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": "Parameters (truncated due to size):"},
-                            "annotations": {"italic": True}
-                        }]
-                    }
-                })
-                self._add_large_code_block(blocks, param_text, "json")
+        return blocks
+
+    def iter_endpoint_blocks(self, endpoints: Iterable[Dict[str, Any]], include_errors: bool = False, toggle_mode: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        for endpoint in endpoints:
+            yield self._render_endpoint(endpoint, include_errors, toggle_mode)
+
+    def _render_endpoint(self, endpoint: Dict[str, Any], include_errors: bool = False, toggle_mode: bool = False) -> List[Dict[str, Any]]:
+        with self.metrics.phase('render'):
+            if toggle_mode:
+                # トグルモードの場合は各エンドポイントをトグルブロックで囲む
+                blocks = self._create_toggle_endpoint(endpoint, include_errors)
             else:
-                blocks.append({
-                    "type": "code",
-                    "code": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": param_text}
-                        }],
-                        "language": "json"
-                    }
-                })
-        
-        # リクエストボディ
-        if endpoint['request_body'] and endpoint['request_body'].get('content'):
-            blocks.append({
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": "Request Body"}
-                    }]
-                }
-            })
-            
-            if endpoint['request_body'].get('description'):
-                blocks.append({
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": endpoint['request_body']['description']}
-                        }]
-                    }
-                })
-            
-            for media_type, content in endpoint['request_body']['content'].items():
-                if content.get('schema'):
-                    schema_text = self._simplify_schema(content['schema'])
-                    # Notion has a 2000 character limit for code blocks
-                    if len(schema_text) > 2000:
-                        blocks.append({
-                            "type": "paragraph",
-                            "paragraph": {
-                                "rich_text": [{
-                                    "type": "text",
-                                    "text": {"content": "Schema (truncated due to size):"},
-                                    "annotations": {"italic": True}
-                                }]
-                            }
-                        })
-                        # Split large schema into multiple blocks
-                        self._add_large_code_block(blocks, schema_text, "json")
-                    else:
-                        blocks.append({
-                            "type": "code",
-                            "code": {
-                                "rich_text": [{
-                                    "type": "text",
-                                    "text": {"content": schema_text}
-                                }],
-                                "language": "json"
-                            }
-                        })
-        
-        # レスポンス
-        if endpoint['responses']:
-            blocks.append({
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": "Responses"}
-                    }]
-                }
-            })
-            
-            for status_code, response in endpoint['responses'].items():
-                # Skip error responses if not requested
-                if not include_errors and status_code.startswith(('4', '5')):
-                    continue
-                blocks.append({
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": f"Status Code: {status_code}"},
-                            "annotations": {"bold": True}
-                        }]
-                    }
-                })
-                
-                if response.get('description'):
-                    blocks.append({
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{
-                                "type": "text",
-                                "text": {"content": response['description']}
-                            }]
-                        }
-                    })
-                
-                for media_type, content in response.get('content', {}).items():
-                    if content.get('schema'):
-                        schema_text = self._simplify_schema(content['schema'])
-                        # Notion has a 2000 character limit for code blocks
-                        if len(schema_text) > 2000:
-                            blocks.append({
-                                "type": "paragraph",
-                                "paragraph": {
-                                    "rich_text": [{
-                                        "type": "text",
-                                        "text": {"content": "Schema (truncated due to size):"},
-                                        "annotations": {"italic": True}
-                                    }]
-                                }
-                            })
-                            # Split large schema into multiple blocks
-                            self._add_large_code_block(blocks, schema_text, "json")
-                        else:
-                            blocks.append({
-                                "type": "code",
-                                "code": {
-                                    "rich_text": [{
-                                        "type": "text",
-                                        "text": {"content": schema_text}
-                                    }],
-                                    "language": "json"
-                                }
-                            })
-        
-        # 区切り線
-        blocks.append({"type": "divider", "divider": {}})
-        
+                # 通常モード
+                blocks = self._create_endpoint_blocks(endpoint, include_errors)
+            return self.validator.check(blocks, f"{endpoint['method']} {endpoint['path']}")
+
+    def _render_for_upload(self, endpoint: Dict[str, Any], include_errors: bool = False, toggle_mode: bool = False) -> List[Dict[str, Any]]:
+        # 直せない問題のあるブロックは、それを含むリクエストを送る前に止める（それまでのリクエストは送信済み）
+        blocks = self._render_endpoint(endpoint, include_errors, toggle_mode)
+        if self.validator.issues:
+            issues = self.validator.issues
+            self.validator.reset()
+            raise PreflightError(issues)
         return blocks
-    
-    def _create_toggle_endpoint(self, endpoint: Dict[str, Any], include_errors: bool = False) -> List[Dict[str, Any]]:
-        # トグルのタイトル（サマリーは含めない）
-        toggle_title = f"{endpoint['method']} {endpoint['path']}"
-        
-        # トグル内のコンテンツブロックを作成
+
+    def preflight(self, endpoints: Iterable[Dict[str, Any]], include_errors: bool = False, toggle_mode: bool = False) -> None:
+        # --preflight: 送信を始める前に全てのエンドポイントをレンダリングし、直せない問題があればNotion APIを呼ばずに止める
+        # レンダリングのキャッシュが残るので、本番のレンダリングはその分速くなる
+        with self.metrics.phase('preflight'):
+            for _ in self.iter_endpoint_blocks(endpoints, include_errors, toggle_mode):
+                pass
+        issues, summary = self.validator.issues, self.validator.summary()
+        self.validator.reset()
+        if summary:
+            print(f"Preflight fixed: {summary}")
+        if issues:
+            raise PreflightError(issues)
+
+    # エンドポイントのセクションの表。フラットでもトグルでも、この順にブロックを出力する
+    # セクションを追加するときはここにメソッド名を加え、レイアウトを追加するときは入れ物だけを作る
+    endpoint_sections = (
+        '_render_summary',
+        '_render_description',
+        '_render_tags',
+        '_render_parameters',
+        '_render_request_body',
+        '_render_responses'
+    )
+
+    def _create_endpoint_blocks(self, endpoint: Dict[str, Any], include_errors: bool = False) -> List[Block]:
+        # エンドポイント名（H2見出し）、各セクション、区切り線
+        blocks = [heading_2(f"{endpoint['method']} {endpoint['path']}")]
+        self._render_sections(blocks, endpoint, include_errors)
+        blocks.append(DIVIDER)
+        return blocks
+
+    def _create_toggle_endpoint(self, endpoint: Dict[str, Any], include_errors: bool = False) -> List[Block]:
+        # トグルのタイトル（サマリーは含めない）の中に各セクション、その後に区切り線
         content_blocks = []
-        
-        # サマリー（トグル内に表示）
+        self._render_sections(content_blocks, endpoint, include_errors)
+        return [toggle(f"{endpoint['method']} {endpoint['path']}", content_blocks), DIVIDER]
+
+    def _render_sections(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
+        for section in self._sections:
+            section(blocks, endpoint, include_errors)
+
+    def _render_summary(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
         if endpoint['summary']:
-            content_blocks.append({
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": endpoint['summary']}
-                    }]
-                }
-            })
-        
-        # 説明
+            blocks.append(paragraph(endpoint['summary']))
+
+    def _render_description(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
         if endpoint['description']:
-            content_blocks.append({
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": endpoint['description']}
-                    }]
-                }
-            })
-        
-        # タグ
+            blocks.append(paragraph(endpoint['description']))
+
+    def _render_tags(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
         if endpoint['tags']:
-            content_blocks.append({
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": f"Tags: {', '.join(endpoint['tags'])}"},
-                        "annotations": {"italic": True}
-                    }]
-                }
-            })
-        
-        # パラメータ
-        if endpoint['parameters']:
-            content_blocks.append({
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": "Parameters"}
-                    }]
-                }
-            })
-            
-            param_text = self._format_parameters(endpoint['parameters'])
-            if len(param_text) > 2000:
-                content_blocks.append({
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": "Parameters (truncated due to size):"},
-                            "annotations": {"italic": True}
-                        }]
-                    }
-                })
-                self._add_large_code_block(content_blocks, param_text, "json")
-            else:
-                content_blocks.append({
-                    "type": "code",
-                    "code": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": param_text}
-                        }],
-                        "language": "json"
-                    }
-                })
-        
-        # リクエストボディ
-        if endpoint['request_body'] and endpoint['request_body'].get('content'):
-            content_blocks.append({
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": "Request Body"}
-                    }]
-                }
-            })
-            
-            if endpoint['request_body'].get('description'):
-                content_blocks.append({
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": endpoint['request_body']['description']}
-                        }]
-                    }
-                })
-            
-            for media_type, content in endpoint['request_body']['content'].items():
+            blocks.append(paragraph(f"Tags: {', '.join(endpoint['tags'])}", "italic"))
+
+    def _render_parameters(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
+        parameters = endpoint['parameters']
+        if parameters:
+            blocks.append(PARAMETERS_HEADING)
+            self._add_code_blocks(blocks, self._format_parameters(parameters), PARAMETERS_TRUNCATED)
+
+    def _render_request_body(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
+        request_body = endpoint['request_body']
+        if not request_body or not request_body.get('content'):
+            return
+        blocks.append(REQUEST_BODY_HEADING)
+        if request_body.get('description'):
+            blocks.append(paragraph(request_body['description']))
+        for content in request_body['content'].values():
+            if content.get('schema'):
+                self._add_schema_blocks(blocks, content['schema'])
+
+    def _render_responses(self, blocks: List[Block], endpoint: Dict[str, Any], include_errors: bool) -> None:
+        responses = endpoint['responses']
+        if not responses:
+            return
+        blocks.append(RESPONSES_HEADING)
+        for status_code in responses:
+            # エラーレスポンスをスキップする場合はスキーマを解決しない
+            if not include_errors and status_code.startswith(('4', '5')):
+                continue
+            response = responses[status_code]
+            blocks.append(paragraph(f"Status Code: {status_code}", "bold"))
+            if response.get('description'):
+                blocks.append(paragraph(response['description']))
+            for content in response.get('content', {}).values():
                 if content.get('schema'):
-                    schema_text = self._simplify_schema(content['schema'])
-                    # Notion has a 2000 character limit for code blocks
-                    if len(schema_text) > 2000:
-                        content_blocks.append({
-                            "type": "paragraph",
-                            "paragraph": {
-                                "rich_text": [{
-                                    "type": "text",
-                                    "text": {"content": "Schema (truncated due to size):"},
-                                    "annotations": {"italic": True}
-                                }]
-                            }
-                        })
-                        # Split large schema into multiple blocks
-                        self._add_large_code_block(content_blocks, schema_text, "json")
-                    else:
-                        content_blocks.append({
-                            "type": "code",
-                            "code": {
-                                "rich_text": [{
-                                    "type": "text",
-                                    "text": {"content": schema_text}
-                                }],
-                                "language": "json"
-                            }
-                        })
-        
-        # レスポンス
-        if endpoint['responses']:
-            content_blocks.append({
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": "Responses"}
-                    }]
-                }
-            })
-            
-            for status_code, response in endpoint['responses'].items():
-                # Skip error responses if not requested
-                if not include_errors and status_code.startswith(('4', '5')):
-                    continue
-                
-                content_blocks.append({
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": f"Status Code: {status_code}"},
-                            "annotations": {"bold": True}
-                        }]
-                    }
-                })
-                
-                if response.get('description'):
-                    content_blocks.append({
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{
-                                "type": "text",
-                                "text": {"content": response['description']}
-                            }]
-                        }
-                    })
-                
-                for media_type, content in response.get('content', {}).items():
-                    if content.get('schema'):
-                        schema_text = self._simplify_schema(content['schema'])
-                        # Notion has a 2000 character limit for code blocks
-                        if len(schema_text) > 2000:
-                            content_blocks.append({
-                                "type": "paragraph",
-                                "paragraph": {
-                                    "rich_text": [{
-                                        "type": "text",
-                                        "text": {"content": "Schema (truncated due to size):"},
-                                        "annotations": {"italic": True}
-                                    }]
-                                }
-                            })
-                            # Split large schema into multiple blocks
-                            self._add_large_code_block(content_blocks, schema_text, "json")
-                        else:
-                            content_blocks.append({
-                                "type": "code",
-                                "code": {
-                                    "rich_text": [{
-                                        "type": "text",
-                                        "text": {"content": schema_text}
-                                    }],
-                                    "language": "json"
-                                }
-                            })
-        
-        # トグルブロックを作成
-        toggle_block = {
-            "type": "toggle",
-            "toggle": {
-                "rich_text": [{
-                    "type": "text",
-                    "text": {"content": toggle_title}
-                }],
-                "children": content_blocks
-            }
-        }
-        
-        # 区切り線を追加
-        return [toggle_block, {"type": "divider", "divider": {}}]
-    
+                    self._add_schema_blocks(blocks, content['schema'])
+
+    def _add_schema_blocks(self, blocks: List[Block], schema: Dict[str, Any]) -> None:
+        # 共有コンポーネントのスキーマはコードブロックまで作ったものを使い回す
+        blocks.extend(self.render_cache.schema_blocks(schema, self._render_schema_blocks))
+
+    def _render_schema_blocks(self, schema: Dict[str, Any]) -> List[Block]:
+        blocks = []
+        self._add_code_blocks(blocks, self._render_simplified_schema(schema), SCHEMA_TRUNCATED)
+        return blocks
+
+    def _add_code_blocks(self, blocks: List[Block], text: str, truncated_notice: Block) -> None:
+        # Notion has a 2000 character limit for code blocks
+        if len(text) > 2000:
+            # Split large text into multiple blocks
+            blocks.append(truncated_notice)
+            self._add_large_code_block(blocks, text, "json")
+        else:
+            blocks.append(code(text, "json"))
+
     def _format_parameters(self, parameters: List[Dict[str, Any]]) -> str:
-        import json
         formatted_params = {}
         for param in parameters:
             param_name = param['name']
@@ -496,8 +272,11 @@ class NotionAPIClient:
             
             formatted_params[param_name] = param_type
         
-        return json.dumps(formatted_params, indent=2, ensure_ascii=False)
-    
+        if not formatted_params or not all(isinstance(value, str) for value in formatted_params.values()):
+            return json.dumps(formatted_params, indent=2, ensure_ascii=False)
+        # 値が全て文字列なら json.dumps(indent=2) と同じ出力を1行ずつ組み立てる
+        return '{\n' + ',\n'.join(parameter_line(name, value) for name, value in formatted_params.items()) + '\n}'
+
     def _get_simple_type(self, schema: Dict[str, Any]) -> str:
         schema_type = schema.get('type', 'any')
         
@@ -519,23 +298,29 @@ class NotionAPIClient:
             return "object"
         else:
             return schema_type
-    
+
     def _format_schema(self, schema: Dict[str, Any]) -> str:
-        import json
         return json.dumps(schema, indent=2, ensure_ascii=False)
-    
-    def _simplify_schema(self, schema: Dict[str, Any]) -> str:
-        import json
-        simplified = self._simplify_schema_recursive(schema)
-        return json.dumps(simplified, indent=2, ensure_ascii=False)
-    
-    def _simplify_schema_recursive(self, schema: Dict[str, Any], required_fields: List[str] = None) -> Union[Dict, str, List]:
+
+    def _render_simplified_schema(self, schema: Dict[str, Any]) -> str:
+        # 共有コンポーネントは1つのスキーマの中で1回だけ展開する
+        simplified = self._simplify_schema_recursive(schema, expanded=set())
+        return dump_indented_json(simplified)
+
+    def _simplify_schema_recursive(self, schema: Dict[str, Any], required_fields: List[str] = None, expanded: set = None) -> Union[Dict, str, List]:
         if required_fields is None:
             required_fields = schema.get('required', [])
         
-        # Handle references
+        # Handle references (only circular references remain unresolved)
         if '$ref' in schema:
-            return "reference"
+            ref_name = schema['$ref'].split('/')[-1].replace('~1', '/').replace('~0', '~')
+            return f"{ref_name} (circular reference)"
+
+        # 2回目以降（展開済みのモデルの中も含む）は名前だけにして、出力がモデルの参照の深さで指数的に増えないようにする
+        if isinstance(schema, ResolvedSchema) and expanded is not None:
+            if schema.ref in expanded:
+                return f"<{schema.name}>"
+            expanded.add(schema.ref)
         
         schema_type = schema.get('type', 'object')
         
@@ -543,7 +328,7 @@ class NotionAPIClient:
             properties = schema.get('properties', {})
             result = {}
             for key, value in properties.items():
-                field_type = self._simplify_schema_recursive(value, required_fields)
+                field_type = self._simplify_schema_recursive(value, required_fields, expanded)
                 if key not in required_fields:
                     if isinstance(field_type, str):
                         field_type = f"{field_type} | Optional"
@@ -555,7 +340,7 @@ class NotionAPIClient:
         
         elif schema_type == 'array':
             items = schema.get('items', {})
-            item_type = self._simplify_schema_recursive(items, required_fields)
+            item_type = self._simplify_schema_recursive(items, required_fields, expanded)
             return [item_type]
         
         elif schema_type == 'string':
@@ -574,29 +359,23 @@ class NotionAPIClient:
         
         else:
             return schema_type
-    
-    def _add_large_code_block(self, blocks: List[Dict[str, Any]], content: str, language: str) -> None:
+
+    def _add_large_code_block(self, blocks: List[Block], content: str, language: str) -> None:
+        for chunk_text in self.render_cache.code_chunks(content, self._split_code_text):
+            blocks.append(code(chunk_text, language))
+
+    def _split_code_text(self, content: str) -> List[str]:
         # Split content into chunks of 1900 characters (leaving some margin)
         max_length = 1900
         lines = content.split('\n')
+        chunks = []
         current_chunk = []
         current_length = 0
         
         for line in lines:
             line_length = len(line) + 1  # +1 for newline
             if current_length + line_length > max_length and current_chunk:
-                # Add current chunk as a code block
-                chunk_text = '\n'.join(current_chunk)
-                blocks.append({
-                    "type": "code",
-                    "code": {
-                        "rich_text": [{
-                            "type": "text",
-                            "text": {"content": chunk_text}
-                        }],
-                        "language": language
-                    }
-                })
+                chunks.append('\n'.join(current_chunk))
                 current_chunk = [line]
                 current_length = line_length
             else:
@@ -605,18 +384,9 @@ class NotionAPIClient:
         
         # Add remaining chunk
         if current_chunk:
-            chunk_text = '\n'.join(current_chunk)
-            blocks.append({
-                "type": "code",
-                "code": {
-                    "rich_text": [{
-                        "type": "text",
-                        "text": {"content": chunk_text}
-                    }],
-                    "language": language
-                }
-            })
-    
+            chunks.append('\n'.join(current_chunk))
+        return chunks
+
     def _normalize_page_id(self, page_id: str) -> str:
         # Remove any existing hyphens
         page_id = page_id.replace('-', '')
@@ -625,47 +395,273 @@ class NotionAPIClient:
         if len(page_id) == 32:
             return f"{page_id[:8]}-{page_id[8:12]}-{page_id[12:16]}-{page_id[16:20]}-{page_id[20:]}"
         return page_id
-    
+
+    def _print_upload_summary(self, uploader: BlockUploader) -> None:
+        # 公開処理の後に両方のクライアントから呼ぶ（rate_limiterはそれぞれのクライアントが持つ）
+        if uploader.blocks_skipped:
+            print(f"Skipped {uploader.blocks_skipped} blocks already uploaded before the interruption")
+        print(f"Uploaded {uploader.blocks_uploaded} blocks in {uploader.requests_sent} requests "
+              f"({uploader.elapsed:.1f}s, {uploader.blocks_per_second:.1f} blocks/sec, "
+              f"{self.rate_limiter.retry_count} retries, {self.rate_limiter.throttle_count} throttled)")
+        print(f"Render cache: {self.render_cache.summary()}")
+
+
+class NotionAPIClient(EndpointRenderer):
+    def __init__(self, token: str = None, base_url: str = None, rate_limiter: RateLimiter = None, metrics: Metrics = None, client=None):
+        super().__init__(metrics=metrics)
+        self.token = token or os.getenv('NOTION_TOKEN')
+        # clientを渡した場合（ドライランなど）はトークンは不要
+        if client is None and not self.token:
+            raise ValueError("Notion token is required. Set NOTION_TOKEN environment variable or pass token parameter.")
+        # base_urlを変えるとローカルのテスト用サーバーに接続できる
+        self.base_url = base_url or os.getenv('NOTION_BASE_URL')
+        if client is not None:
+            self.client = client
+        elif self.base_url:
+            self.client = Client(auth=self.token, base_url=self.base_url)
+        else:
+            self.client = Client(auth=self.token)
+        # 全てのNotion API呼び出しはこのレートリミッターを通す
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+    def create_endpoint_documentation(self, page_id: str, endpoints: Iterable[Dict[str, Any]], include_errors: bool = False, batch_size: int = 5, verify_page: bool = False, toggle_mode: bool = False, concurrency: int = 1, journal_path: str = None, resume: bool = False, layout: str = 'single') -> None:
+        # Normalize page ID format (add hyphens if needed)
+        page_id = self._normalize_page_id(page_id)
+        
+        # Optional page verification
+        if verify_page:
+            try:
+                page = self.rate_limiter.call(self.metrics.timed('pages.retrieve', self.client.pages.retrieve), page_id)
+                print(f"Successfully connected to page: {page.get('properties', {}).get('title', {}).get('title', [{}])[0].get('plain_text', 'Untitled')}")
+            except Exception as e:
+                print(f"Error accessing page {page_id}: {e}")
+                raise
+        else:
+            print(f"Connecting to Notion page: {page_id}")
+        
+        # エンドポイントをレンダリングしながら、1リクエスト分のブロックが溜まるたびにアップロードする
+        total = len(endpoints) if hasattr(endpoints, '__len__') else None
+        # ジャーナルに追加済みのリクエストを記録し、--resumeで失敗した箇所から再開できるようにする
+        journal = CheckpointJournal(journal_path, page_id, resume=resume) if journal_path else None
+        if journal is not None and resume:
+            print(f"Resuming upload: {len(journal.entries)} requests already completed")
+        uploader = BlockUploader(self.client, self.rate_limiter, concurrency=concurrency, journal=journal, metrics=self.metrics)
+        try:
+            with tqdm(total=total, desc="Publishing endpoints") as pbar:
+                if layout == 'tag-pages':
+                    self._publish_tag_pages(page_id, endpoints, uploader, include_errors, toggle_mode, pbar)
+                elif layout == 'database':
+                    self._publish_database(page_id, endpoints, uploader, include_errors, toggle_mode, pbar)
+                else:
+                    self._publish_blocks(page_id, endpoints, uploader, include_errors, toggle_mode, pbar)
+        finally:
+            uploader.close()
+            if journal is not None:
+                journal.close()
+
+        self._print_upload_summary(uploader)
+
+    def upload_rendered_blocks(self, page_id: str, blocks: List[Dict[str, Any]], concurrency: int = 1, journal_path: str = None, resume: bool = False, progress=None) -> BlockUploader:
+        # 別のプロセスでレンダリング済みのブロックをページに追加する（バッチモード用）
+        # 複数のページから同時に呼ばれても、共有のレートリミッターで全体のレートを守る
+        page_id = self._normalize_page_id(page_id)
+        journal = CheckpointJournal(journal_path, page_id, resume=resume) if journal_path else None
+        uploader = BlockUploader(self.client, self.rate_limiter, concurrency=concurrency, progress=progress, journal=journal, metrics=self.metrics)
+        try:
+            self._upload_blocks(page_id, blocks, uploader)
+        finally:
+            uploader.close()
+            if journal is not None:
+                journal.close()
+        return uploader
+
+    def _publish_blocks(self, parent_id: str, endpoints: Iterable[Dict[str, Any]], uploader: BlockUploader, include_errors: bool, toggle_mode: bool, pbar) -> None:
+        stream = BlockStream(uploader, parent_id)
+        try:
+            for endpoint in endpoints:
+                stream.add(self._render_for_upload(endpoint, include_errors, toggle_mode))
+                pbar.update(1)
+            stream.close()
+        finally:
+            stream.cancel()
+
+    def _publish_tag_pages(self, page_id: str, endpoints: Iterable[Dict[str, Any]], uploader: BlockUploader, include_errors: bool, toggle_mode: bool, pbar) -> None:
+        # タグごとに子ページを作成し、各ページの中身を並行して追加する
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for endpoint in endpoints:
+            tag = endpoint['tags'][0] if endpoint['tags'] else 'Untagged'
+            groups.setdefault(tag, []).append(endpoint)
+        tags = list(groups)
+
+        with ThreadPoolExecutor(max_workers=uploader.concurrency) as pool:
+            page_ids = dict(zip(tags, pool.map(lambda tag: uploader.create_page(page_id, tag), tags)))
+            uploader.append(page_id, self._create_tag_index_blocks(tags, page_ids, groups))
+
+            futures = [
+                pool.submit(self._publish_blocks, page_ids[tag], groups[tag], uploader, include_errors, toggle_mode, pbar)
+                for tag in tags
+            ]
+            for future in futures:
+                future.result()
+
+    def _publish_database(self, page_id: str, endpoints: Iterable[Dict[str, Any]], uploader: BlockUploader, include_errors: bool, toggle_mode: bool, pbar) -> None:
+        # エンドポイントごとに1行のデータベースを作成し、詳細のブロックは各行のページの中身にする
+        # 行はそれぞれ独立しているので、レンダリングしながらワーカーで並行して作成する
+        database_id = uploader.create_database(page_id, 'API Endpoints', ENDPOINT_DATABASE_PROPERTIES)
+        for endpoint in endpoints:
+            blocks = self._render_for_upload(endpoint, include_errors, toggle_mode)
+            uploader.submit_row(database_id, SyncManifest.endpoint_key(endpoint), self._create_endpoint_row_properties(endpoint), blocks)
+            pbar.update(1)
+        uploader.wait()
+
+    def sync_endpoint_documentation(self, page_id: str, endpoints: Iterable[Dict[str, Any]], manifest_path: str, include_errors: bool = False, toggle_mode: bool = False, concurrency: int = 1) -> None:
+        # 前回の同期結果（マニフェスト）と比較して、変更のあったエンドポイントだけを更新する
+        page_id = self._normalize_page_id(page_id)
+        manifest = SyncManifest(manifest_path, page_id)
+        previous = manifest.entries
+        # ページ上で最初にある同期済みのエンドポイント（その前に挿入する場合の目印）
+        top_key = next((key for key, entry in previous.items() if entry['block_ids']), None)
+
+        # 変更のないエンドポイントのブロックはハッシュを取った後すぐに捨てる
+        # 先頭のエンドポイントは、前に挿入するために書き直す場合があるので残しておく
+        rendered = []
+        total = len(endpoints) if hasattr(endpoints, '__len__') else None
+        with tqdm(total=total, desc="Processing endpoints") as pbar:
+            for endpoint in endpoints:
+                key = SyncManifest.endpoint_key(endpoint)
+                blocks = self._render_for_upload(endpoint, include_errors, toggle_mode)
+                digest = SyncManifest.hash_blocks(blocks)
+                if key in previous and previous[key]['hash'] == digest and key != top_key:
+                    blocks = None
+                rendered.append((key, blocks, digest))
+                pbar.update(1)
+
+        current_keys = {key for key, _, _ in rendered}
+        changed = [key for key, _, digest in rendered if key in previous and previous[key]['hash'] != digest]
+        anchor = self._find_leading_anchor(page_id, rendered, previous, top_key, changed)
+        added = [key for key, _, _ in rendered if key not in previous]
+        removed = [key for key in previous if key not in current_keys]
+        unchanged = len(rendered) - len(changed) - len(added)
+        print(f"\nSync plan: {unchanged} unchanged, {len(changed)} changed, {len(added)} added, {len(removed)} removed")
+
+        # 古いブロックは新しいブロックを挿入した後で削除する（挿入位置の目印として使うため）
+        stale_block_ids = manifest.stale_block_ids + [
+            block_id for key in changed + removed for block_id in previous[key]['block_ids']
+        ]
+        pending = [(key, blocks, digest) for key, blocks, digest in rendered if key in changed or key in added]
+
+        entries = {}
+        with tqdm(total=sum(count_blocks(blocks) for _, blocks, _ in pending), desc="Uploading blocks") as pbar:
+            uploader = BlockUploader(self.client, self.rate_limiter, concurrency=concurrency, progress=pbar, metrics=self.metrics)
+            try:
+                run = []
+                for key, blocks, digest in rendered:
+                    entry = previous.get(key)
+                    if entry and entry['hash'] == digest and entry['block_ids'] and key not in changed:
+                        self._write_sync_run(page_id, run, anchor, previous, uploader, entries)
+                        run = []
+                        entries[key] = entry
+                        anchor = entry['block_ids'][-1]
+                    else:
+                        run.append((key, blocks, digest))
+                self._write_sync_run(page_id, run, anchor, previous, uploader, entries)
+
+                uploader.delete(stale_block_ids)
+                uploader.wait()
+                stale_block_ids = []
+            finally:
+                uploader.close()
+                # 途中で失敗しても、書き込み済みのブロックと未処理のブロックを記録しておく
+                for key in previous:
+                    if key not in entries and key not in changed and key not in removed:
+                        entries[key] = previous[key]
+                manifest.entries = entries
+                manifest.stale_block_ids = stale_block_ids
+                manifest.save()
+
+        self._print_upload_summary(uploader)
+
+    def _write_sync_run(self, page_id: str, run: List[Any], anchor: str, previous: Dict[str, Any], uploader: BlockUploader, entries: Dict[str, Any]) -> None:
+        if not run:
+            return
+
+        if anchor is None:
+            first_key = run[0][0]
+            if first_key in previous and previous[first_key]['block_ids']:
+                # 変更されたエンドポイントは古いブロックの直後に挿入する
+                anchor = previous[first_key]['block_ids'][-1]
+
+        blocks = [block for _, endpoint_blocks, _ in run for block in endpoint_blocks]
+        block_ids = self._upload_blocks(page_id, blocks, uploader, after=anchor)
+
+        # 返ってきたトップレベルのブロックIDをエンドポイントごとに割り当てる
+        offset = 0
+        for key, endpoint_blocks, digest in run:
+            entries[key] = {
+                'hash': digest,
+                'block_ids': block_ids[offset:offset + len(endpoint_blocks)]
+            }
+            offset += len(endpoint_blocks)
+
+    def _find_leading_anchor(self, page_id: str, rendered: List[Any], previous: Dict[str, Any], top_key: str, changed: List[str]) -> str:
+        # 仕様の先頭に追加されたエンドポイントを、同期済みの最初のブロックの前に挿入するための目印を返す
+        if not rendered or top_key is None:
+            return None
+        first_key = rendered[0][0]
+        if first_key in previous and previous[first_key]['block_ids']:
+            # 先頭が変更のないエンドポイントならその後ろに、変更されたものなら古いブロックの後ろに続ける
+            return None
+        found, preceding = self._find_preceding_block(page_id, previous[top_key]['block_ids'][0])
+        if not found or preceding is not None:
+            # 見つからなければ（手で削除された場合など）ページの末尾に追加する
+            return preceding
+        # ページの先頭には挿入できないので、先頭のエンドポイントの後ろに挿入し、先頭のエンドポイントも書き直して古いブロックを消す
+        if top_key not in changed and any(key == top_key for key, _, _ in rendered):
+            changed.append(top_key)
+        return previous[top_key]['block_ids'][-1]
+
+    def _find_preceding_block(self, page_id: str, block_id: str) -> Tuple[bool, str]:
+        # 管理下の最初のブロックの直前のブロックを探す（見つかったか, 直前のブロック（先頭ならNone））
+        preceding = None
+        start_cursor = None
+        while True:
+            kwargs = {'start_cursor': start_cursor} if start_cursor else {}
+            response = self.rate_limiter.call(self.metrics.timed('blocks.children.list', self.client.blocks.children.list), block_id=page_id, **kwargs)
+            for block in response.get('results', []):
+                if self._normalize_page_id(block['id']) == self._normalize_page_id(block_id):
+                    return True, preceding
+                preceding = block['id']
+            if not response.get('has_more'):
+                return False, None
+            start_cursor = response.get('next_cursor')
+
     def _append_blocks_to_page(self, page_id: str, blocks: List[Dict[str, Any]]) -> None:
         # Notion APIは一度に最大100ブロックまでしか追加できない
         max_blocks_per_request = 100
         
         for i in range(0, len(blocks), max_blocks_per_request):
             chunk = blocks[i:i + max_blocks_per_request]
-            self.client.blocks.children.append(
+            self.rate_limiter.call(
+                self.metrics.timed('blocks.children.append', self.client.blocks.children.append),
                 block_id=page_id,
                 children=chunk
             )
-    
-    def _append_blocks_in_batches(self, page_id: str, blocks: List[Dict[str, Any]], batch_size: int) -> None:
-        # Notion APIは一度に最大100ブロックまでしか追加できない
-        max_blocks_per_request = 100
-        
+
+    def _append_blocks_in_batches(self, page_id: str, blocks: List[Dict[str, Any]], batch_size: int, concurrency: int = 1) -> None:
         # プログレスバーを表示
-        with tqdm(total=len(blocks), desc="Uploading blocks") as pbar:
-            for i in range(0, len(blocks), max_blocks_per_request):
-                chunk = blocks[i:i + max_blocks_per_request]
-                try:
-                    self.client.blocks.children.append(
-                        block_id=page_id,
-                        children=chunk
-                    )
-                    pbar.update(len(chunk))
-                    
-                    # APIレート制限を避けるため少し待機
-                    if i + max_blocks_per_request < len(blocks):
-                        time.sleep(0.5)
-                        
-                except Exception as e:
-                    print(f"\\nError uploading blocks {i}-{i+len(chunk)}: {e}")
-                    # 失敗した場合は少し待って再試行
-                    time.sleep(2)
-                    try:
-                        self.client.blocks.children.append(
-                            block_id=page_id,
-                            children=chunk
-                        )
-                        pbar.update(len(chunk))
-                    except Exception as e2:
-                        print(f"\\nFailed to upload blocks after retry: {e2}")
-                        raise
\ No newline at end of file
+        with tqdm(total=count_blocks(blocks), desc="Uploading blocks") as pbar:
+            uploader = BlockUploader(self.client, self.rate_limiter, concurrency=concurrency, progress=pbar, metrics=self.metrics)
+            try:
+                self._upload_blocks(page_id, blocks, uploader)
+            finally:
+                uploader.close()
+
+        self._print_upload_summary(uploader)
+
+    def _upload_blocks(self, page_id: str, blocks: List[Dict[str, Any]], uploader: BlockUploader, after: str = None) -> List[str]:
+        stream = BlockStream(uploader, page_id, after=after)
+        try:
+            stream.add(blocks)
+            return stream.close()
+        finally:
+            stream.cancel()
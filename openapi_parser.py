@@ -1,43 +1,251 @@
 import yaml
-from typing import Dict, List, Any
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Tuple, Iterator, Set
+from urllib.parse import unquote
+import hashlib
 import json
+import os
+import re
+import time
+from spec_cache import SpecCache
+from metrics import Metrics
+from endpoint_filter import EndpointFilter
+
+# libyamlが使える場合はC実装のローダーを使う
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# キャッシュに保存する内容の形を変えたら上げる（古いキャッシュはキーが変わって使われなくなる）
+__version__ = '1.4.1'
+
+# キャッシュのエントリに必要なキー（足りないエントリは古い形式として読み直す）
+CACHE_ENTRY_KEYS = ('spec', 'documents', 'document_digests', 'external_refs', 'ref_cycles')
+
+# スキーマではなく値そのものを表すキー（中の$refは解決しない）
+DATA_KEYWORDS = ('example', 'examples', 'enum', 'default', 'const')
+# キーがプロパティやコンポーネントの名前になっている辞書（「default」などの名前もキーワードとして扱わない）
+NAME_MAP_KEYWORDS = ('properties', 'patternProperties', 'definitions', '$defs', 'schemas', 'responses')
+
+# ファイル内に「#」以外で始まる$ref（外部参照）があるかを、パースする前に調べる
+EXTERNAL_REF_PATTERN = re.compile(rb'["\']?\$ref["\']?\s*:\s*["\']?[^#"\'\s]')
 
 
 class OpenAPIParser:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, cache: SpecCache = None, metrics: Metrics = None, endpoint_filter: EndpointFilter = None, max_workers: int = 8,
+                 previous: 'OpenAPIParser' = None):
         self.file_path = file_path
-        self.spec = self._load_spec()
+        self.max_workers = max_workers
+        # 監視モードでの再読み込みでは、内容の変わっていないファイルは前回のパース結果を使う
+        self._previous_parsed = previous._parsed if previous is not None else {}
+        self._parsed: Dict[str, Tuple[str, Any, Set[str]]] = {}
+        # 外部参照で読み込んだファイル（正規化したパスごとに1回だけ読む）と、その内容のSHA-256
+        # パスはルートのファイルのディレクトリからの相対パスで、$refの「#」の前にもこの形で書く
+        self.documents: Dict[str, Any] = {}
+        self.document_digests: Dict[str, str] = {}
+        self._root_dir = os.path.dirname(os.path.realpath(file_path))
+        self._root_key = self._document_key(os.path.realpath(file_path))
+        self._external_refs: Set[str] = set()
+        self.metrics = metrics or Metrics()
+        # 条件に一致しないオペレーションはパースもレンダリングもしない
+        self.endpoint_filter = endpoint_filter or EndpointFilter()
+        # キャッシュがあればパース済みの仕様と参照の索引の情報を再利用する
+        self.cache = cache
+        self._cache_key = None
+        self._cached = None
+        with self.metrics.phase('load_spec'):
+            self.spec = self._load_spec()
+        # components以下のJSONポインタの索引と、解決済みスキーマのキャッシュ
+        with self.metrics.phase('index_refs'):
+            self._ref_index = self._build_ref_index()
+            self._ref_cycles = self._cached['ref_cycles'] if self._cached else self._find_ref_cycles()
+        self._resolved_refs: Dict[Any, Any] = {}
         
     def _load_spec(self) -> Dict[str, Any]:
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file)
+        started = time.perf_counter()
+        data = self._read_file(self.file_path)
+
+        if self.cache is not None:
+            self._cache_key = self.cache.key_for(data)
+            # 参照先のファイルが変わっていればキャッシュは使わない
+            self._cached = self.cache.get(self._cache_key, validate=self._cache_entry_valid)
+            if self._cached is not None:
+                self.documents = self._cached['documents']
+                self.document_digests = self._cached['document_digests']
+                self._external_refs = self._cached['external_refs']
+                self.load_format = 'cache'
+                self.load_time = time.perf_counter() - started
+                return self._cached['spec']
+
+        spec, self.load_format, refs = self._load_parsed(data, self._root_key, self.file_path)
+        if refs:
+            self._load_external_documents(refs)
+
+        self.load_time = time.perf_counter() - started
+        return spec
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as file:
+            return file.read()
+
+    @staticmethod
+    def _parse_document(data: bytes, path: str) -> Tuple[Any, str]:
+        text = data.decode('utf-8-sig')
+        if path.endswith('.json') or text.lstrip()[:1] == '{':
+            try:
+                return (orjson.loads(text) if orjson else json.loads(text)), 'json'
+            except ValueError:
+                # JSONとして読めない場合はYAMLとして読む
+                pass
+        return yaml.load(text, Loader=SafeLoader), 'yaml'
+
+    def _load_external_documents(self, pending: Set[str]) -> None:
+        # 外部参照されているファイルを並行して読み込む
+        # 読み込んだファイルからさらに参照されているファイルは、見つかった時点で読み込みを始める
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {}
+            requested = set()
+
+            def request(refs: Set[str], source: str) -> None:
+                self._external_refs.update(refs)
+                for ref in refs:
+                    key = ref.partition('#')[0]
+                    if key not in requested:
+                        requested.add(key)
+                        futures[pool.submit(self._load_document, key, source)] = key
+
+            request(pending, self._root_key)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = futures.pop(future)
+                    document, digest, refs = future.result()
+                    self.documents[key] = document
+                    self.document_digests[key] = digest
+                    request(refs, key)
+
+    def _load_document(self, key: str, source: str) -> Tuple[Any, str, Set[str]]:
+        path = self._document_path(key)
+        try:
+            data = self._read_file(path)
+        except FileNotFoundError:
+            raise ValueError(f"Referenced file not found: {path} (referenced from {source})")
+        document, _, refs = self._load_parsed(data, key, path)
+        return document, self._parsed[key][0], refs
+
+    def _load_parsed(self, data: bytes, key: str, path: str) -> Tuple[Any, str, Set[str]]:
+        digest = hashlib.sha256(data).hexdigest()
+        previous = self._previous_parsed.get(key)
+        if previous is not None and previous[0] == digest:
+            self._parsed[key] = previous
+            return previous[1], 'memory', previous[2]
+
+        document, load_format = self._parse_document(data, path)
+        if key != self._root_key or EXTERNAL_REF_PATTERN.search(data):
+            refs = self._rewrite_refs(document, key)
+        else:
+            refs = set()
+        self._parsed[key] = (digest, document, refs)
+        return document, load_format, refs
+
+    def source_files(self) -> List[str]:
+        # 仕様のファイルと、外部参照で読み込んだファイルのパス
+        return [self.file_path] + [self._document_path(key) for key in self.documents]
+
+    def _document_key(self, path: str) -> str:
+        return os.path.relpath(path, self._root_dir).replace(os.sep, '/')
+
+    def _document_path(self, key: str) -> str:
+        return os.path.normpath(os.path.join(self._root_dir, key))
+
+    def _rewrite_refs(self, document: Any, key: str) -> Set[str]:
+        # ドキュメント内の$refを「ファイル#ポインタ」の形に書き換え、外部参照の一覧を返す
+        # ルートのファイルへの参照は「#ポインタ」の形にする
+        refs = set()
+        for current in iter_ref_holders(document):
+            ref = current.get('$ref')
+            if isinstance(ref, str):
+                canonical = self._canonical_ref(ref, key)
+                if canonical != ref:
+                    current['$ref'] = canonical
+                if not canonical.startswith('#') and '://' not in canonical:
+                    refs.add(canonical)
+        return refs
+
+    def _canonical_ref(self, ref: str, key: str) -> str:
+        location, _, pointer = ref.partition('#')
+        if '://' in location:
+            # URLの参照は読み込まない（解決しようとしたときにエラーになる）
+            return ref
+        if location:
+            base_dir = os.path.dirname(self._document_path(key))
+            target = self._document_key(os.path.realpath(os.path.join(base_dir, unquote(location))))
+        else:
+            target = key
+        if target == self._root_key:
+            return f"#{pointer}"
+        return f"{target}#{pointer}"
+
+    def _cache_entry_valid(self, cached: Any) -> bool:
+        if not isinstance(cached, dict) or any(key not in cached for key in CACHE_ENTRY_KEYS):
+            return False
+        return self._documents_unchanged(cached)
+
+    def _documents_unchanged(self, cached: Dict[str, Any]) -> bool:
+        for key, digest in cached['document_digests'].items():
+            try:
+                if hashlib.sha256(self._read_file(self._document_path(key))).hexdigest() != digest:
+                    return False
+            except OSError:
+                return False
+        return True
     
     def get_endpoints(self) -> List[Dict[str, Any]]:
-        endpoints = []
+        return list(self.iter_endpoints())
+
+    def iter_endpoints(self) -> Iterator[Dict[str, Any]]:
+        # エンドポイントを1つずつパースして返す（返したエンドポイントは保持しないので、何度でも最初から返せる）
+        for path, method, operation in self._iter_operations():
+            # パースの時間だけを記録する（yieldの間は含めない。スキーマの解決はレンダリング時に行われる）
+            with self.metrics.phase('parse_endpoints'):
+                endpoint = self._parse_endpoint(path, method, operation)
+            yield endpoint
+
+        # エンドポイントは仕様からすぐに作れるのでキャッシュには入れず、パース結果と参照の情報だけを保存する
+        # 最初のエンドポイントを送るのを待たせないように、書き込みは全て返した後に行う
+        if self.cache is not None and self._cached is None:
+            self._cached = {
+                'spec': self.spec,
+                'documents': self.documents,
+                'document_digests': self.document_digests,
+                'external_refs': self._external_refs,
+                'ref_cycles': self._ref_cycles
+            }
+            self.cache.put(self._cache_key, self._cached)
+
+    def count_endpoints(self) -> int:
+        return sum(1 for _ in self._iter_operations())
+
+    def _iter_operations(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
         paths = self.spec.get('paths', {})
         
         for path, path_item in paths.items():
             for method, operation in path_item.items():
                 if method in ['get', 'post', 'put', 'delete', 'patch', 'options', 'head']:
-                    endpoint = self._parse_endpoint(path, method, operation)
-                    endpoints.append(endpoint)
-        
-        return endpoints
+                    if self.endpoint_filter.matches(path, operation):
+                        yield path, method, operation
     
     def _parse_endpoint(self, path: str, method: str, operation: Dict[str, Any]) -> Dict[str, Any]:
-        endpoint = {
-            'path': path,
-            'method': method.upper(),
-            'summary': operation.get('summary', ''),
-            'description': operation.get('description', ''),
-            'operation_id': operation.get('operationId', ''),
-            'tags': operation.get('tags', []),
-            'parameters': self._parse_parameters(operation.get('parameters', [])),
-            'request_body': self._parse_request_body(operation.get('requestBody', {})),
-            'responses': self._parse_responses(operation.get('responses', {}))
-        }
-        
-        return endpoint
+        # パラメータ・リクエストボディ・レスポンスのスキーマは、レンダリングで使われるときに初めて解決する
+        return LazyEndpoint(self, path, method, operation)
     
     def _parse_parameters(self, parameters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         parsed_params = []
@@ -50,7 +258,7 @@ class OpenAPIParser:
                 'in': param.get('in', ''),
                 'required': param.get('required', False),
                 'description': param.get('description', ''),
-                'schema': param.get('schema', {})
+                'schema': self._resolve_schema(param.get('schema', {}))
             }
             parsed_params.append(parsed_param)
         
@@ -71,9 +279,7 @@ class OpenAPIParser:
         }
         
         for media_type, media_type_obj in content.items():
-            schema = media_type_obj.get('schema', {})
-            if '$ref' in schema:
-                schema = self._resolve_ref(schema['$ref'])
+            schema = self._resolve_schema(media_type_obj.get('schema', {}))
             parsed_body['content'][media_type] = {
                 'schema': schema,
                 'example': media_type_obj.get('example', {})
@@ -82,41 +288,273 @@ class OpenAPIParser:
         return parsed_body
     
     def _parse_responses(self, responses: Dict[str, Any]) -> Dict[str, Any]:
-        parsed_responses = {}
+        # ステータスコードごとに、アクセスされたときに解決する（不要なエラーレスポンスは解決しない）
+        return LazyResponses(self, responses)
+
+    def _parse_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        if '$ref' in response:
+            response = self._resolve_ref(response['$ref'])
         
-        for status_code, response in responses.items():
-            if '$ref' in response:
-                response = self._resolve_ref(response['$ref'])
-            
-            parsed_response = {
-                'description': response.get('description', ''),
-                'content': {}
+        parsed_response = {
+            'description': response.get('description', ''),
+            'content': {}
+        }
+        
+        content = response.get('content', {})
+        for media_type, media_type_obj in content.items():
+            schema = self._resolve_schema(media_type_obj.get('schema', {}))
+            parsed_response['content'][media_type] = {
+                'schema': schema,
+                'example': media_type_obj.get('example', {})
             }
-            
-            content = response.get('content', {})
-            for media_type, media_type_obj in content.items():
-                schema = media_type_obj.get('schema', {})
-                if '$ref' in schema:
-                    schema = self._resolve_ref(schema['$ref'])
-                parsed_response['content'][media_type] = {
-                    'schema': schema,
-                    'example': media_type_obj.get('example', {})
-                }
-            
-            parsed_responses[status_code] = parsed_response
         
-        return parsed_responses
+        return parsed_response
     
     def _resolve_ref(self, ref: str) -> Dict[str, Any]:
-        parts = ref.split('/')
-        if parts[0] != '#':
-            raise ValueError(f"External references not supported: {ref}")
-        
-        current = self.spec
-        for part in parts[1:]:
-            current = current.get(part, {})
-        
+        target = self._ref_index.get(ref)
+        if target is None:
+            target = self._lookup_pointer(ref)
+            self._ref_index[ref] = target
+        return target
+
+    def _lookup_pointer(self, ref: str) -> Any:
+        location, _, pointer = ref.partition('#')
+        if location:
+            current = self.documents.get(location)
+            if current is None:
+                raise ValueError(f"External reference could not be loaded: {ref}")
+        else:
+            current = self.spec
+        for part in unquote(pointer).split('/')[1:]:
+            # JSONポインタのエスケープ（~1 は /、~0 は ~）
+            part = part.replace('~1', '/').replace('~0', '~')
+            if isinstance(current, dict):
+                current = current.get(part, {})
+            elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+                current = current[int(part)]
+            else:
+                return {}
         return current
-    
+
+    def _build_ref_index(self) -> Dict[str, Any]:
+        index = {}
+        components = self.spec.get('components', {}) if isinstance(self.spec, dict) else {}
+        for section, items in components.items():
+            if not isinstance(items, dict):
+                continue
+            for name, obj in items.items():
+                index[f"#/components/{self._escape_pointer(section)}/{self._escape_pointer(name)}"] = obj
+        # 外部参照の参照先も循環の検出の対象にする
+        for ref in self._external_refs:
+            index[ref] = self._lookup_pointer(ref)
+        return index
+
+    @staticmethod
+    def _escape_pointer(part: str) -> str:
+        return str(part).replace('~', '~0').replace('/', '~1')
+
+    def _find_ref_cycles(self) -> Dict[str, frozenset]:
+        # components間の参照グラフの強連結成分を求め、循環に含まれる参照ごとにその成分を返す
+        graph = {ref: self._collect_refs(obj) for ref, obj in self._ref_index.items()}
+        cycles = {}
+        index_of = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        counter = 0
+
+        for root in graph:
+            if root in index_of:
+                continue
+            work = [(root, iter(graph[root]))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, edges = work[-1]
+                advanced = False
+                for target in edges:
+                    if target not in graph:
+                        continue
+                    if target not in index_of:
+                        index_of[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(graph[target])))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[target])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in graph[node]:
+                        members = frozenset(component)
+                        for member in component:
+                            cycles[member] = members
+        return cycles
+
+    def _collect_refs(self, obj: Any) -> set:
+        refs = set()
+        for current in iter_ref_holders(obj):
+            ref = current.get('$ref')
+            if isinstance(ref, str):
+                refs.add(ref)
+        return refs
+
+    def _resolve_schema(self, schema: Any, stack: Tuple[str, ...] = (), names: bool = False) -> Any:
+        # ネストした$refも含めて解決する。循環参照は$refのまま残す
+        # names: schemaがプロパティ名などをキーにした辞書で、値が全てスキーマであること
+        if isinstance(schema, list):
+            return [self._resolve_schema(item, stack) for item in schema]
+        if not isinstance(schema, dict):
+            return schema
+        if names:
+            return {key: self._resolve_schema(value, stack) for key, value in schema.items()}
+
+        ref = schema.get('$ref')
+        if isinstance(ref, str):
+            if ref in stack:
+                return schema
+            # 循環に含まれる参照の解決結果は、経路上にある同じ循環の参照によって変わる
+            cycle = self._ref_cycles.get(ref)
+            key = (ref, cycle.intersection(stack)) if cycle else ref
+            if key not in self._resolved_refs:
+                resolved = self._resolve_schema(self._resolve_ref(ref), stack + (ref,))
+                if isinstance(resolved, dict):
+                    resolved = ResolvedSchema(resolved, ref)
+                self._resolved_refs[key] = resolved
+            return self._resolved_refs[key]
+
+        return {
+            key: value if key in DATA_KEYWORDS else self._resolve_schema(value, stack, key in NAME_MAP_KEYWORDS)
+            for key, value in schema.items()
+        }
+
     def format_schema_as_json(self, schema: Dict[str, Any]) -> str:
-        return json.dumps(schema, indent=2, ensure_ascii=False)
\ No newline at end of file
+        return json.dumps(schema, indent=2, ensure_ascii=False)
+
+
+def iter_ref_holders(document: Any) -> Iterator[Dict[str, Any]]:
+    # $refを持ちうる辞書を全て返す。値そのものを表すキーの中は辿らない
+    pending = [(document, False)]
+    while pending:
+        current, names = pending.pop()
+        if isinstance(current, dict):
+            if names:
+                pending.extend((value, False) for value in current.values())
+                continue
+            yield current
+            pending.extend(
+                (value, key in NAME_MAP_KEYWORDS) for key, value in current.items() if key not in DATA_KEYWORDS
+            )
+        elif isinstance(current, list):
+            pending.extend((item, False) for item in current)
+
+
+class ResolvedSchema(dict):
+    # $refを解決したスキーマ。同じコンポーネントを使っている全ての箇所で同じオブジェクトを共有する
+    # レンダリングで同じコンポーネントを何度も展開しないように、参照先の名前を持つ
+    def __init__(self, schema: Dict[str, Any], ref: str):
+        super().__init__(schema)
+        self.ref = ref
+
+    @property
+    def name(self) -> str:
+        location, _, pointer = self.ref.partition('#')
+        name = pointer.rsplit('/', 1)[-1] if pointer else os.path.basename(location)
+        return unquote(name).replace('~1', '/').replace('~0', '~')
+
+
+class LazyEndpoint(MutableMapping):
+    # エンドポイントの辞書として振る舞い、重いセクションは最初にアクセスされたときに解決する
+    # 複数のスレッドから同時に解決されても、解決済みのスキーマは共有されているので結果は同じになる
+    keys_order = ('path', 'method', 'summary', 'description', 'operation_id', 'tags', 'parameters', 'request_body', 'responses')
+    __slots__ = ('_parser', '_operation', '_data')
+
+    def __init__(self, parser: OpenAPIParser, path: str, method: str, operation: Dict[str, Any]):
+        self._parser = parser
+        self._operation = operation
+        self._data = {
+            'path': path,
+            'method': method.upper(),
+            'summary': operation.get('summary', ''),
+            'description': operation.get('description', ''),
+            'operation_id': operation.get('operationId', ''),
+            'tags': operation.get('tags', [])
+        }
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        if key not in ('parameters', 'request_body', 'responses'):
+            raise KeyError(key)
+        # 解決はレンダリングの途中で行われるので、parse_endpoints とは別のフェーズとして記録する
+        with self._parser.metrics.phase('resolve_schemas'):
+            if key == 'parameters':
+                value = self._parser._parse_parameters(self._operation.get('parameters', []))
+            elif key == 'request_body':
+                value = self._parser._parse_request_body(self._operation.get('requestBody', {}))
+            else:
+                value = self._parser._parse_responses(self._operation.get('responses', {}))
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.keys_order:
+            raise KeyError(key)
+        self._data[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Endpoint fields cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_order)
+
+    def __len__(self) -> int:
+        return len(self.keys_order)
+
+    def __reduce__(self):
+        # キャッシュなどにpickleするときは、全て解決した普通の辞書として保存する
+        return (dict, (dict(self),))
+
+
+class LazyResponses(Mapping):
+    # ステータスコードからレスポンスへの辞書として振る舞い、値はアクセスされたときに解決する
+    __slots__ = ('_parser', '_responses', '_parsed')
+
+    def __init__(self, parser: OpenAPIParser, responses: Dict[str, Any]):
+        self._parser = parser
+        self._responses = responses
+        self._parsed: Dict[str, Any] = {}
+
+    def __getitem__(self, status_code: str) -> Dict[str, Any]:
+        parsed = self._parsed.get(status_code)
+        if parsed is None:
+            with self._parser.metrics.phase('resolve_schemas'):
+                parsed = self._parsed[status_code] = self._parser._parse_response(self._responses[status_code])
+        return parsed
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._responses)
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
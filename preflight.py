@@ -0,0 +1,115 @@
+from typing import Dict, List, Any
+import threading
+from blocks import Block, AnyBlock, MAX_RICH_TEXT_LENGTH, MAX_RICH_TEXT_ITEMS, text_length, split_rich_text
+from request_planner import block_children, payload_size, without_children, with_children
+
+# 1回のリクエストで送れる子ブロックの入れ子は2段まで
+MAX_NESTING_DEPTH = 2
+# 1つのブロックに入るテキストはrich_textの要素数×要素ごとの長さまで
+MAX_BLOCK_TEXT_LENGTH = MAX_RICH_TEXT_LENGTH * MAX_RICH_TEXT_ITEMS
+TRUNCATED_SUFFIX = "\n... (truncated)"
+
+
+class PreflightError(ValueError):
+    def __init__(self, issues: List[str]):
+        self.issues = issues
+        super().__init__(f"{len(issues)} blocks exceed Notion API limits and cannot be fixed automatically")
+
+    def __reduce__(self):
+        # バッチモードのワーカープロセスから問題の一覧ごと受け取れるようにする
+        return PreflightError, (self.issues,)
+
+
+class PreflightValidator:
+    # 送信前にレンダリング済みのブロックをNotion APIの制限と照らし合わせる
+    # 直せるもの（長いテキストの分割や切り詰め）は直し、直せないものは issues に記録する
+    # 子ブロックの数とリクエストのサイズによる分割は RequestPlanner が行うので、ここでは1ブロック単位で見る
+    def __init__(self, max_bytes: int = 480_000):
+        self.max_bytes = max_bytes
+        self.fixes: Dict[str, int] = {}
+        self.issues: List[str] = []
+        self._lock = threading.Lock()
+
+    def check(self, blocks: List[AnyBlock], context: str) -> List[AnyBlock]:
+        # 直したブロックは新しく作る（レンダリングのキャッシュで共有しているブロックは書き換えない）
+        return [self._check_block(block, context, 0) for block in blocks]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.fixes = {}
+            self.issues = []
+
+    def summary(self) -> str:
+        return ', '.join(f"{count} {name}" for name, count in sorted(self.fixes.items()))
+
+    def _check_block(self, block: AnyBlock, context: str, depth: int) -> AnyBlock:
+        if isinstance(block, Block):
+            checked = self._check_text(block, context)
+        else:
+            checked = self._check_rich_text(block, context)
+
+        children = block_children(checked)
+        if children:
+            if depth >= MAX_NESTING_DEPTH:
+                self._issue(f"{context}: {self._kind(checked)} block is nested deeper than {MAX_NESTING_DEPTH} levels")
+            checked_children = [self._check_block(child, context, depth + 1) for child in children]
+            if any(new is not old for new, old in zip(checked_children, children)):
+                checked = with_children(checked, checked_children)
+        return checked
+
+    def _check_text(self, block: Block, context: str) -> Block:
+        text = block.text
+        # ほとんどのテキストは短いので、UTF-16での長さは必要なときだけ数える
+        if text is None or len(text) <= MAX_RICH_TEXT_LENGTH // 2:
+            return block
+        length = text_length(text)
+        if length > MAX_BLOCK_TEXT_LENGTH:
+            # 最後の要素に切り詰めた旨を入れて、rich_textの要素数の上限に収める
+            text = ''.join(split_rich_text(text)[:MAX_RICH_TEXT_ITEMS - 1]) + TRUNCATED_SUFFIX
+            block = Block(block.kind, text, block.annotation, block.language, block.children)
+            self._fix('texts truncated')
+        elif length > MAX_RICH_TEXT_LENGTH:
+            # 分割はブロックをNotion APIの形式にするときに行う
+            self._fix('texts split into rich_text segments')
+        # JSONにすると1文字が最大6バイトになるので、それで上限を超えうる場合だけ実際に計測する
+        if len(text) * 6 > self.max_bytes:
+            self._check_size(block, context)
+        return block
+
+    def _check_rich_text(self, block: Dict[str, Any], context: str) -> Dict[str, Any]:
+        content = block.get(block.get('type'))
+        rich_text = content.get('rich_text') if isinstance(content, dict) else None
+        if rich_text:
+            items = []
+            for item in rich_text:
+                text = item.get('text') if item.get('type') == 'text' else None
+                if text is None or text_length(text.get('content', '')) <= MAX_RICH_TEXT_LENGTH:
+                    items.append(item)
+                    continue
+                # 装飾やリンクは分割した全ての要素に付ける
+                items.extend({**item, 'text': {**text, 'content': segment}} for segment in split_rich_text(text['content']))
+                self._fix('texts split into rich_text segments')
+            if len(items) > MAX_RICH_TEXT_ITEMS:
+                self._issue(f"{context}: {block['type']} block has {len(items)} rich_text items (limit {MAX_RICH_TEXT_ITEMS})")
+            if len(items) != len(rich_text):
+                block = {**block, block['type']: {**content, 'rich_text': items}}
+        self._check_size(block, context)
+        return block
+
+    def _check_size(self, block: AnyBlock, context: str) -> None:
+        # 子ブロックは別のリクエストに分けられるので、ブロック自身の大きさだけを見る
+        size = payload_size(without_children(block) if block_children(block) else block)
+        if size > self.max_bytes:
+            self._issue(f"{context}: {self._kind(block)} block is {size} bytes, larger than a whole request ({self.max_bytes} bytes)")
+
+    @staticmethod
+    def _kind(block: AnyBlock) -> str:
+        return block.kind if isinstance(block, Block) else block.get('type')
+
+    def _fix(self, name: str) -> None:
+        with self._lock:
+            self.fixes[name] = self.fixes.get(name, 0) + 1
+
+    def _issue(self, message: str) -> None:
+        with self._lock:
+            self.issues.append(message)
@@ -0,0 +1,155 @@
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable
+from datetime import datetime, timezone
+import asyncio
+import httpx
+import logging
+import random
+import threading
+import time
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = (409, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    # Notion APIの平均レート制限（1秒あたり3リクエスト）に合わせたトークンバケット
+    def __init__(self, rate: float = 3.0, burst: int = 5, min_rate: float = 0.5, max_retries: int = 6,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0, recovery_successes: int = 20):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.recovery_successes = recovery_successes
+        self.throttle_count = 0
+        self.retry_count = 0
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._success_streak = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retry_count += 1
+                logger.info(f"Retrying Notion request in {delay:.1f}s (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    def _reserve(self) -> float:
+        # トークンがあれば消費して0を返し、なければ待つべき秒数を返す
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        if isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+            return self._backoff(attempt)
+        if not isinstance(error, HTTPResponseError):
+            return None
+        if error.status == 429:
+            retry_after = self._parse_retry_after(error.headers.get('Retry-After'))
+            self._on_throttle(retry_after)
+            return retry_after if retry_after is not None else self._backoff(attempt)
+        if error.status in RETRYABLE_STATUSES:
+            return self._backoff(attempt)
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        # 指数バックオフ（ジッター付き）
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _parse_retry_after(self, value: str) -> float:
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def _on_throttle(self, retry_after: float) -> None:
+        # スロットリングされたらレートを半分に下げ、Retry-Afterの間は全リクエストを止める
+        with self._lock:
+            self.throttle_count += 1
+            self._success_streak = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def _on_success(self) -> None:
+        # 成功が続いたら元のレートまで少しずつ戻す
+        with self._lock:
+            self._success_streak += 1
+            if self.rate < self.max_rate and self._success_streak >= self.recovery_successes:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+                self._success_streak = 0
+
+
+class AsyncRateLimiter(RateLimiter):
+    # asyncio版: 待機中もイベントループを止めず、他のリクエストの送信を続けられる
+    # トークンバケットとリトライの判定はRateLimiterと共通
+    async def acquire(self) -> None:
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            await self.acquire()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retry_count += 1
+                logger.info(f"Retrying Notion request in {delay:.1f}s (attempt {attempt}/{self.max_retries}): {e}")
+                await asyncio.sleep(delay)
+                continue
+            self._on_success()
+            return result
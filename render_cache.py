@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Any, Callable, List
+import threading
+
+
+class RenderCache:
+    # 共有コンポーネントのスキーマは解決済みの同じオブジェクトとして渡ってくるので、
+    # オブジェクトのIDをキーにして、簡略化したJSONのコードブロックと分割済みのコードを使い回す
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._schemas = OrderedDict()
+        self._chunks = OrderedDict()
+        self.schema_hits = 0
+        self.schema_misses = 0
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+        # 複数のページを並行してレンダリングする場合があるため
+        self._lock = threading.Lock()
+
+    def schema_blocks(self, schema: Any, render: Callable[[Any], List[Any]]) -> List[Any]:
+        # 返したブロックのリストは共有されるので、呼び出し側で変更しない
+        key = id(schema)
+        with self._lock:
+            entry = self._schemas.get(key)
+            if entry is not None and entry[0] is schema:
+                self._schemas.move_to_end(key)
+                self.schema_hits += 1
+                return entry[1]
+            self.schema_misses += 1
+
+        blocks = render(schema)
+        # スキーマ自体も保持して、IDが別のオブジェクトに再利用されないようにする
+        self._store(self._schemas, key, (schema, blocks))
+        return blocks
+
+    def code_chunks(self, text: str, split: Callable[[str], List[str]]) -> List[str]:
+        with self._lock:
+            chunks = self._chunks.get(text)
+            if chunks is not None:
+                self._chunks.move_to_end(text)
+                self.chunk_hits += 1
+                return chunks
+            self.chunk_misses += 1
+
+        chunks = split(text)
+        self._store(self._chunks, text, chunks)
+        return chunks
+
+    def summary(self) -> str:
+        return (f"schema cache {self.schema_hits} hits / {self.schema_misses} misses, "
+                f"code chunk cache {self.chunk_hits} hits / {self.chunk_misses} misses")
+
+    def _store(self, entries: OrderedDict, key: Any, value: Any) -> None:
+        with self._lock:
+            entries[key] = value
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
@@ -0,0 +1,141 @@
+from typing import Dict, List, Any, Tuple
+import json
+from blocks import Block, to_notion
+
+
+class PlannedRequest:
+    # 1回の blocks.children.append で送るブロックと、その後に追加する子ブロック
+    __slots__ = ('blocks', 'payload', 'deferred', 'detached', 'nested', 'size')
+
+    def __init__(self):
+        self.blocks: List[Dict[str, Any]] = []
+        # 大きさを測るために展開したNotion APIのJSON（送信時にもう一度展開しないように、そのまま送る）
+        self.payload: List[Dict[str, Any]] = []
+        # 1リクエストに収まらず、作成後のブロックに順番に追加する子ブロック (位置, 子ブロック)
+        self.deferred: List[Tuple[int, List[Dict[str, Any]]]] = []
+        # 1リクエストに収まらず、並行アップロードのために切り離した子ブロック (位置, 子ブロック)
+        self.detached: List[Tuple[int, List[Dict[str, Any]]]] = []
+        self.nested = 0
+        self.size = 0
+
+
+class RequestPlanner:
+    # Notion APIの制限
+    # - 1リクエストのブロック（子ブロックの配列も同様）は最大100個
+    # - ネストした子ブロックを含めて最大1000ブロック
+    # - リクエストボディは最大500KB（余裕を持たせて480KBで分割する）
+    def __init__(self, max_blocks: int = 100, max_nested_blocks: int = 1000, max_bytes: int = 480_000, detach_children: bool = False):
+        self.max_blocks = max_blocks
+        self.max_nested_blocks = max_nested_blocks
+        self.max_bytes = max_bytes
+        self.detach_children = detach_children
+        self._current = PlannedRequest()
+
+    def plan(self, blocks: List[Dict[str, Any]]) -> List[PlannedRequest]:
+        requests = [request for request in (self.add(block) for block in blocks) if request is not None]
+        last = self.finish()
+        if last is not None:
+            requests.append(last)
+        return requests
+
+    def add(self, block: Dict[str, Any]) -> PlannedRequest:
+        # ブロックを現在のリクエストに詰め、収まらなければ完成したリクエストを返す
+        # 順序を保ったまま先頭から貪欲に詰めるのが、リクエスト数が最小になる分け方
+        block, payload, remainder, nested, size = self._fit_children(block)
+        detached = None
+        if remainder and self.detach_children:
+            # 1リクエストに収まらない子ブロックだけを切り離し、親のリクエストの後に並行して追加する
+            # 収まるトグルは切り離さない（リクエスト数が増えると、共有のレート制限でかえって遅くなる）
+            detached, remainder = remainder, None
+
+        completed = None
+        current = self._current
+        if current.blocks and (len(current.blocks) >= self.max_blocks
+                               or current.nested + nested > self.max_nested_blocks
+                               or current.size + size > self.max_bytes):
+            completed = current
+            current = self._current = PlannedRequest()
+
+        if remainder:
+            current.deferred.append((len(current.blocks), remainder))
+        if detached:
+            current.detached.append((len(current.blocks), detached))
+        current.blocks.append(block)
+        current.payload.append(payload)
+        current.nested += nested
+        current.size += size
+        return completed
+
+    def finish(self) -> PlannedRequest:
+        current, self._current = self._current, PlannedRequest()
+        return current if current.blocks else None
+
+    def _fit_children(self, block: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]], int, int]:
+        # ほとんどのブロックはそのまま収まるので、まず全体を1回だけ展開して計測する
+        nested = count_blocks([block])
+        payload = to_notion(block)
+        size = encoded_size(payload)
+        children = block_children(block)
+        if not children or (len(children) <= self.max_blocks and nested <= self.max_nested_blocks and size <= self.max_bytes):
+            return block, payload, None, nested, size
+
+        # 収まらない場合だけ子ブロックを1つずつ計測し、入る分だけ残して残りは後から追加する
+        shell = without_children(block)
+        payload = to_notion(shell)
+        nested = 1
+        size = encoded_size(payload)
+        inline = []
+        for child in children[:self.max_blocks]:
+            child_nested = count_blocks([child])
+            child_payload = to_notion(child)
+            child_size = encoded_size(child_payload) + 1
+            if nested + child_nested > self.max_nested_blocks or size + child_size > self.max_bytes:
+                break
+            nested += child_nested
+            size += child_size
+            inline.append(child_payload)
+
+        if inline:
+            shell = with_children(shell, children[:len(inline)])
+            payload = with_children(payload, inline)
+        return shell, payload, children[len(inline):], nested, size
+
+
+def block_children(block: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if isinstance(block, Block):
+        return block.children
+    content = block.get(block.get('type'))
+    return content.get('children') if isinstance(content, dict) else None
+
+
+def without_children(block: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(block, Block):
+        return block.without_children()
+    content = block[block['type']]
+    return {**block, block['type']: {key: value for key, value in content.items() if key != 'children'}}
+
+
+def with_children(block: Dict[str, Any], children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if isinstance(block, Block):
+        return block.with_children(children)
+    return {**block, block['type']: {**block[block['type']], 'children': children}}
+
+
+def payload_size(block: Dict[str, Any]) -> int:
+    return encoded_size(to_notion(block))
+
+
+def encoded_size(payload: Dict[str, Any]) -> int:
+    # httpxが送信するのと同じ形式でエンコードしたときのバイト数
+    return len(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def count_blocks(blocks: List[Dict[str, Any]]) -> int:
+    # ネストした子ブロックも含めて数える
+    total = 0
+    for block in blocks:
+        total += 1
+        children = block_children(block)
+        if children:
+            total += count_blocks(children)
+    return total
@@ -0,0 +1,95 @@
+from typing import Any, Callable
+import hashlib
+import os
+import pickle
+import tempfile
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'openapi-to-notion')
+
+
+class SpecCache:
+    # パース済みの仕様をファイル内容のSHA-256とツールのバージョンをキーにして保存する
+    suffix = '.pickle'
+
+    def __init__(self, cache_dir: str, version: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, data: bytes) -> str:
+        # キャッシュする内容はファイルの内容とバージョンだけで決まる（エンドポイントの絞り込みは読み込んだ後に行う）
+        digest = hashlib.sha256(data)
+        digest.update(f"\0{self.version}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str, validate: Callable[[Any], bool] = None) -> Any:
+        # validate: キャッシュの内容がまだ使えるかを確かめる関数（参照先のファイルが変わっていないかなど）
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # 壊れたキャッシュは捨てて読み直す
+            self._remove(path)
+            self.misses += 1
+            return None
+        if validate is not None and not validate(value):
+            # 古い形式のエントリは読み直した結果で上書きされる
+            self.misses += 1
+            return None
+        # LRUのために最終利用時刻を更新する
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        # 合計サイズが上限を超えたら、最後に使われたのが古いものから削除する
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,78 @@
+from typing import Dict, List, Any, Callable, Tuple
+import logging
+import os
+import threading
+import time
+from openapi_parser import OpenAPIParser
+
+logger = logging.getLogger(__name__)
+
+
+class SpecWatcher:
+    # 仕様のファイルと外部参照しているファイルの更新をポーリングで監視し、変更があれば読み込み直して公開する
+    # load: 前回のパーサーを受け取り、新しいパーサーを返す（変わっていないファイルは前回のパース結果を使う）
+    # publish: 新しいパーサーのエンドポイントを公開する（--syncで変更のあったエンドポイントだけを更新する）
+    def __init__(self, load: Callable[[OpenAPIParser], OpenAPIParser], publish: Callable[[OpenAPIParser], None],
+                 interval: float = 1.0, debounce: float = 0.5):
+        self.load = load
+        self.publish = publish
+        self.interval = interval
+        # 保存が続いている間は読み込まず、この時間だけ変更がなくなるのを待つ
+        self.debounce = debounce
+        self.reloads = 0
+        self.failures = 0
+        self._stopped = threading.Event()
+
+    def run(self, parser: OpenAPIParser) -> None:
+        snapshot = self._snapshot(parser.source_files())
+        logger.info(f"Watching {len(snapshot)} files for changes (Ctrl+C to stop)")
+        while not self._stopped.wait(self.interval):
+            current = self._snapshot(parser.source_files())
+            if current == snapshot:
+                continue
+            current = self._wait_until_settled(parser.source_files(), current)
+            if current is None:
+                break
+
+            changed = sorted(path for path in set(current) | set(snapshot) if current.get(path) != snapshot.get(path))
+            logger.info(f"Detected changes in {', '.join(os.path.basename(path) for path in changed)}")
+            started = time.perf_counter()
+            try:
+                parser = self.load(parser)
+                self.publish(parser)
+            except Exception as e:
+                # 編集途中の壊れたファイルなどは、次の変更まで待って読み込み直す
+                self.failures += 1
+                logger.error(f"Failed to republish, waiting for the next change: {e}")
+            else:
+                self.reloads += 1
+                logger.info(f"Republished in {time.perf_counter() - started:.1f}s")
+            # 参照しているファイルが増減している場合があるので、新しいパーサーのファイル一覧で取り直す
+            # 読み込み前の状態を基準にして、公開している間の変更も次の周期で拾う
+            snapshot = self._snapshot(parser.source_files(), known=current)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _wait_until_settled(self, paths: List[str], current: Dict[str, Any]) -> Dict[str, Any]:
+        while not self._stopped.wait(self.debounce):
+            settled = self._snapshot(paths)
+            if settled == current:
+                return settled
+            current = settled
+        return None
+
+    @staticmethod
+    def _snapshot(paths: List[str], known: Dict[str, Any] = None) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in paths:
+            if known is not None and path in known:
+                snapshot[path] = known[path]
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                snapshot[path] = None
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
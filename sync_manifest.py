@@ -0,0 +1,54 @@
+from typing import Dict, List, Any
+import hashlib
+import json
+import os
+from blocks import to_notion_blocks
+
+
+class SyncManifest:
+    # エンドポイントごとのブロックのハッシュと、Notion上のブロックIDを記録するファイル
+    format_version = 1
+
+    def __init__(self, path: str, page_id: str):
+        self.path = path
+        self.page_id = page_id
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # 前回の同期で削除しきれなかったブロック
+        self.stale_block_ids: List[str] = []
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get('version') != self.format_version:
+            raise ValueError(f"Unsupported sync manifest version in {self.path}: {data.get('version')}")
+        if data.get('page_id') != self.page_id:
+            raise ValueError(f"Sync manifest {self.path} belongs to page {data.get('page_id')}, not {self.page_id}")
+        self.entries = data.get('endpoints', {})
+        self.stale_block_ids = data.get('stale_block_ids', [])
+
+    def save(self) -> None:
+        data = {
+            'version': self.format_version,
+            'page_id': self.page_id,
+            'endpoints': self.entries,
+            'stale_block_ids': self.stale_block_ids
+        }
+        # 途中で失敗しても壊れたマニフェストが残らないよう、一時ファイルから置き換える
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def endpoint_key(endpoint: Dict[str, Any]) -> str:
+        return f"{endpoint['method']} {endpoint['path']}"
+
+    @staticmethod
+    def hash_blocks(blocks: List[Dict[str, Any]]) -> str:
+        # 展開後のJSONでハッシュを取るので、以前のマニフェストのハッシュとも一致する
+        payload = json.dumps(to_notion_blocks(blocks), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+from typing import Dict, List, Any
+import itertools
+import threading
+import time
+
+
+class FakeNotionClient:
+    # notion_client.Client の代わりに、作成されたブロックをメモリ上のツリーとして保持する
+    # fail_on: 失敗させるリクエストの番号（1から数える）
+    def __init__(self, fail_on: List[int] = None):
+        self.fail_on = set(fail_on or ())
+        self.requests = 0
+        self.children: Dict[str, List[str]] = {}
+        self.contents: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.blocks = SimpleNamespace(
+            children=SimpleNamespace(append=self._append, list=self._list),
+            delete=self._delete
+        )
+        self.pages = SimpleNamespace(create=self._create_page, retrieve=self._retrieve_page)
+        self.databases = SimpleNamespace(create=self._create_database)
+
+    def tree(self, parent_id: str) -> List[Any]:
+        # 親の下のブロックを順番に (種類, テキスト, 子ブロック) で返す
+        return [
+            (self.contents[block_id]['type'], self.text(block_id), self.tree(block_id))
+            for block_id in self.children.get(self._normalize(parent_id), [])
+        ]
+
+    def count(self, parent_id: str) -> int:
+        return sum(1 + self.count(block_id) for block_id in self.children.get(self._normalize(parent_id), []))
+
+    def text(self, block_id: str) -> str:
+        block = self.contents[block_id]
+        content = block.get(block['type'], {})
+        return ''.join(item.get('text', {}).get('content', '') for item in content.get('rich_text', []))
+
+    def _request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        if number in self.fail_on:
+            # 失敗するまでに時間がかかるようにして、その間に後続のリクエストが送信待ちになるようにする
+            time.sleep(0.05)
+            raise RuntimeError(f"request {number} failed")
+
+    def _append(self, block_id: str, children: List[Dict[str, Any]], after: str = None) -> Dict[str, Any]:
+        self._request()
+        with self._lock:
+            ids = self._insert(self._normalize(block_id), children, after)
+        return {'object': 'list', 'results': [{'object': 'block', 'id': block_id} for block_id in ids]}
+
+    def _insert(self, parent_id: str, children: List[Dict[str, Any]], after: str = None) -> List[str]:
+        siblings = self.children.setdefault(parent_id, [])
+        position = siblings.index(after) + 1 if after is not None else len(siblings)
+        ids = []
+        for block in children:
+            block_id = f"{next(self._ids):032x}"
+            content = dict(block[block['type']])
+            nested = content.pop('children', None)
+            self.contents[block_id] = {**block, block['type']: content}
+            if nested:
+                self._insert(block_id, nested)
+            ids.append(block_id)
+        siblings[position:position] = ids
+        return ids
+
+    def _list(self, block_id: str, start_cursor: str = None, page_size: int = 100) -> Dict[str, Any]:
+        self._request()
+        with self._lock:
+            results = [
+                {'object': 'block', 'id': child_id, 'has_children': bool(self.children.get(child_id)), **self.contents[child_id]}
+                for child_id in self.children.get(self._normalize(block_id), [])
+            ]
+        return {'object': 'list', 'results': results, 'next_cursor': None, 'has_more': False}
+
+    def _delete(self, block_id: str) -> Dict[str, Any]:
+        self._request()
+        with self._lock:
+            for siblings in self.children.values():
+                if block_id in siblings:
+                    siblings.remove(block_id)
+        return {'object': 'block', 'id': block_id, 'archived': True}
+
+    def _create_page(self, parent: Dict[str, Any], properties: Dict[str, Any], children: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._request()
+        with self._lock:
+            page_id = f"{next(self._ids):032x}"
+            self.contents[page_id] = {'type': 'child_page', 'child_page': {}}
+            self._insert(page_id, children or [])
+        return {'object': 'page', 'id': page_id}
+
+    def _create_database(self, parent: Dict[str, Any], title: List[Dict[str, Any]], properties: Dict[str, Any]) -> Dict[str, Any]:
+        self._request()
+        return {'object': 'database', 'id': f"{next(self._ids):032x}"}
+
+    def _retrieve_page(self, page_id: str) -> Dict[str, Any]:
+        self._request()
+        return {'object': 'page', 'id': page_id, 'properties': {}}
+
+    @staticmethod
+    def _normalize(block_id: str) -> str:
+        return block_id.replace('-', '')
@@ -0,0 +1,14 @@
+import json
+
+from batch import render_spec
+from synthetic_spec import generate_spec
+
+
+def test_render_spec_does_not_need_a_token(tmp_path, monkeypatch):
+    monkeypatch.delenv('NOTION_TOKEN', raising=False)
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(generate_spec(endpoints=10, schemas=5)))
+    rendered = render_spec(str(spec_path), include_errors=False, toggle_mode=True)
+    assert rendered['endpoints'] == 10
+    assert len(rendered['blocks']) == 20
+    assert rendered['phases']['render']['count'] == 10
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from notion_api_client import NotionAPIClient
+from openapi_parser import OpenAPIParser
+from rate_limiter import RateLimiter
+from synthetic_spec import generate_spec
+from fake_notion_client import FakeNotionClient
+
+PAGE_ID = '0' * 32
+
+
+def publish(tmp_path, fake, **kwargs):
+    client = NotionAPIClient(client=fake, rate_limiter=RateLimiter(rate=10_000, burst=10_000))
+    client.create_endpoint_documentation(PAGE_ID, OpenAPIParser(str(tmp_path / 'spec.json')).get_endpoints(), **kwargs)
+
+
+@pytest.mark.parametrize('failing_request', [2, 3, 5])
+def test_resume_after_failed_append_keeps_block_order(tmp_path, failing_request):
+    (tmp_path / 'spec.json').write_text(json.dumps(generate_spec(endpoints=80, schemas=20)))
+    expected = FakeNotionClient()
+    publish(tmp_path, expected)
+    assert expected.requests > failing_request + 2
+
+    # N番目のリクエストが失敗したら、その後のリクエストは送らずに止まる
+    fake = FakeNotionClient(fail_on=[failing_request])
+    journal_path = str(tmp_path / 'journal.jsonl')
+    with pytest.raises(RuntimeError):
+        publish(tmp_path, fake, journal_path=journal_path)
+    assert fake.requests == failing_request
+
+    publish(tmp_path, fake, journal_path=journal_path, resume=True)
+    assert fake.count(PAGE_ID) == expected.count(PAGE_ID)
+    assert fake.tree(PAGE_ID) == expected.tree(PAGE_ID)
@@ -0,0 +1,86 @@
+import json
+
+from endpoint_filter import EndpointFilter
+from openapi_parser import OpenAPIParser, ResolvedSchema, __version__
+from spec_cache import SpecCache
+from synthetic_spec import generate_spec
+
+
+def write_spec(tmp_path, spec, name='spec.json'):
+    spec_path = tmp_path / name
+    spec_path.write_text(json.dumps(spec))
+    return str(spec_path)
+
+
+def test_properties_named_like_data_keywords_are_resolved(tmp_path):
+    spec = {
+        'openapi': '3.0.0',
+        'info': {'title': 'Keywords', 'version': '1.0.0'},
+        'paths': {
+            '/settings': {
+                'get': {
+                    'responses': {
+                        '200': {
+                            'description': 'OK',
+                            'content': {'application/json': {'schema': {'$ref': '#/components/schemas/Settings'}}}
+                        }
+                    }
+                }
+            }
+        },
+        'components': {
+            'schemas': {
+                'Settings': {
+                    'type': 'object',
+                    'default': {'value': {'$ref': 'not a schema'}},
+                    'properties': {
+                        'default': {'$ref': '#/components/schemas/Value'},
+                        'enum': {'type': 'array', 'items': {'$ref': '#/components/schemas/Value'}}
+                    }
+                },
+                'Value': {'type': 'string'}
+            }
+        }
+    }
+    parser = OpenAPIParser(write_spec(tmp_path, spec))
+    [endpoint] = parser.get_endpoints()
+    schema = endpoint['responses']['200']['content']['application/json']['schema']
+    assert isinstance(schema['properties']['default'], ResolvedSchema)
+    assert schema['properties']['default'] == {'type': 'string'}
+    assert schema['properties']['enum']['items'] == {'type': 'string'}
+    # キーワードとしての default の値はそのまま残す
+    assert schema['default'] == {'value': {'$ref': 'not a schema'}}
+
+
+def test_external_refs_in_default_response_are_loaded(tmp_path):
+    write_spec(tmp_path, {'Error': {'type': 'object', 'properties': {'message': {'type': 'string'}}}}, 'errors.json')
+    spec = {
+        'openapi': '3.0.0',
+        'info': {'title': 'Default response', 'version': '1.0.0'},
+        'paths': {
+            '/items': {
+                'get': {
+                    'responses': {
+                        'default': {
+                            'description': 'Error',
+                            'content': {'application/json': {'schema': {'$ref': 'errors.json#/Error'}}}
+                        }
+                    }
+                }
+            }
+        }
+    }
+    parser = OpenAPIParser(write_spec(tmp_path, spec))
+    [endpoint] = parser.get_endpoints()
+    schema = endpoint['responses']['default']['content']['application/json']['schema']
+    assert schema['properties']['message'] == {'type': 'string'}
+
+
+def test_cache_entry_is_shared_between_endpoint_filters(tmp_path):
+    spec_path = write_spec(tmp_path, generate_spec(endpoints=10, schemas=5))
+    cache = SpecCache(str(tmp_path / 'cache'), __version__)
+    everything = list(OpenAPIParser(spec_path, cache=cache).iter_endpoints())
+    filtered = list(OpenAPIParser(spec_path, cache=cache, endpoint_filter=EndpointFilter(path_globs=[everything[0]['path']])).iter_endpoints())
+    assert cache.hits == 1
+    assert {endpoint['path'] for endpoint in filtered} == {everything[0]['path']}
+    assert len(filtered) < len(everything)
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from blocks import paragraph, toggle
+from notion_api_client import NotionAPIClient
+from openapi_parser import OpenAPIParser
+from preflight import PreflightError
+from rate_limiter import RateLimiter
+from synthetic_spec import generate_spec
+from fake_notion_client import FakeNotionClient
+
+PAGE_ID = '0' * 32
+
+
+def client_with_bad_endpoint(fake, bad_index):
+    # bad_index番目のエンドポイントだけ、直せない（入れ子が深すぎる）ブロックをレンダリングする
+    client = NotionAPIClient(client=fake, rate_limiter=RateLimiter(rate=10_000, burst=10_000))
+    rendered = []
+    create_endpoint_blocks = client._create_endpoint_blocks
+
+    def create_blocks(endpoint, include_errors=False):
+        rendered.append(endpoint['path'])
+        if len(rendered) - 1 == bad_index:
+            return [toggle('bad', [toggle('b', [toggle('c', [paragraph('d')])])])]
+        return create_endpoint_blocks(endpoint, include_errors)
+
+    client._create_endpoint_blocks = create_blocks
+    return client
+
+
+def test_streaming_stops_before_the_request_with_the_bad_block(tmp_path):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(generate_spec(endpoints=40, schemas=10)))
+    endpoints = OpenAPIParser(str(spec_path)).get_endpoints()
+
+    fake = FakeNotionClient()
+    client = client_with_bad_endpoint(fake, 30)
+    with pytest.raises(PreflightError) as error:
+        client.create_endpoint_documentation(PAGE_ID, endpoints)
+    assert len(error.value.issues) == 1
+    # 問題のあるブロックは送らず、それより前のエンドポイントだけが送られている
+    assert 0 < fake.requests
+    assert 'bad' not in [text for _, text, _ in fake.tree(PAGE_ID)]
+    assert client.validator.issues == []
+
+
+def test_preflight_sends_nothing(tmp_path):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(generate_spec(endpoints=40, schemas=10)))
+    endpoints = OpenAPIParser(str(spec_path)).get_endpoints()
+
+    fake = FakeNotionClient()
+    client = client_with_bad_endpoint(fake, 30)
+    with pytest.raises(PreflightError):
+        client.preflight(endpoints)
+    assert fake.requests == 0
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from blocks import paragraph, toggle, to_notion_blocks
+from notion_api_client import NotionAPIClient
+from openapi_parser import OpenAPIParser
+from rate_limiter import RateLimiter
+from request_planner import RequestPlanner
+from synthetic_spec import generate_spec
+from fake_notion_client import FakeNotionClient
+
+PAGE_ID = '0' * 32
+
+
+def publish(tmp_path, concurrency):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(generate_spec(endpoints=60, schemas=20)))
+    fake = FakeNotionClient()
+    client = NotionAPIClient(client=fake, rate_limiter=RateLimiter(rate=10_000, burst=10_000))
+    client.create_endpoint_documentation(PAGE_ID, OpenAPIParser(str(spec_path)).get_endpoints(), toggle_mode=True, concurrency=concurrency)
+    return fake
+
+
+@pytest.mark.parametrize('concurrency', [2, 4])
+def test_request_count_does_not_grow_with_concurrency(tmp_path, concurrency):
+    sequential = publish(tmp_path, 1)
+    concurrent = publish(tmp_path, concurrency)
+    assert concurrent.requests == sequential.requests
+    assert concurrent.tree(PAGE_ID) == sequential.tree(PAGE_ID)
+
+
+def test_toggles_that_fit_are_not_detached():
+    planner = RequestPlanner(detach_children=True)
+    requests = planner.plan([toggle(f"toggle {i}", [paragraph(str(j)) for j in range(10)]) for i in range(5)])
+    assert len(requests) == 1
+    assert requests[0].detached == []
+
+
+def test_children_that_do_not_fit_are_detached_in_order(tmp_path):
+    planner = RequestPlanner(detach_children=True)
+    children = [paragraph(str(j)) for j in range(250)]
+    [request] = planner.plan([paragraph('before'), toggle('big', children), paragraph('after')])
+    assert len(request.blocks) == 3
+    [(index, detached)] = request.detached
+    assert index == 1
+    assert request.blocks[1].children + detached == children
+
+    fake = FakeNotionClient()
+    client = NotionAPIClient(client=fake, rate_limiter=RateLimiter(rate=10_000, burst=10_000))
+    client.upload_rendered_blocks(PAGE_ID, [paragraph('before'), toggle('big', children), paragraph('after')], concurrency=3)
+    [before, big, after] = fake.tree(PAGE_ID)
+    assert (before[1], after[1]) == ('before', 'after')
+    assert [text for _, text, _ in big[2]] == [str(j) for j in range(250)]
+
+
+def test_planned_payload_is_the_converted_blocks():
+    planner = RequestPlanner(max_bytes=20_000)
+    blocks = [paragraph('x' * 3000), toggle('big', [paragraph(str(j) * 50) for j in range(300)]), paragraph('after')]
+    requests = planner.plan(blocks)
+    assert len(requests) > 1
+    for request in requests:
+        # 送信するJSONは、ブロックをもう一度展開したものと同じ
+        assert request.payload == to_notion_blocks(request.blocks)
+        assert request.size <= planner.max_bytes
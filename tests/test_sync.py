@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from notion_api_client import NotionAPIClient
+from openapi_parser import OpenAPIParser
+from rate_limiter import RateLimiter
+from fake_notion_client import FakeNotionClient
+
+PAGE_ID = '0' * 32
+
+
+def make_spec(paths):
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': 'Sync test', 'version': '1.0.0'},
+        'paths': {
+            path: {'get': {'summary': summary, 'responses': {'200': {'description': 'OK'}}}}
+            for path, summary in paths
+        }
+    }
+
+
+def sync(tmp_path, fake, paths):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(make_spec(paths)))
+    client = NotionAPIClient(client=fake, rate_limiter=RateLimiter(rate=10_000, burst=10_000))
+    client.sync_endpoint_documentation(PAGE_ID, OpenAPIParser(str(spec_path)).get_endpoints(), str(tmp_path / 'manifest.json'))
+
+
+def page(intro):
+    # intro: 同期したブロックの前に手で書いた段落があるページ
+    fake = FakeNotionClient()
+    if intro:
+        fake.blocks.children.append(block_id=PAGE_ID, children=[{'type': 'paragraph', 'paragraph': {'rich_text': [{'type': 'text', 'text': {'content': 'intro'}}]}}])
+    return fake
+
+
+@pytest.mark.parametrize('intro', [False, True])
+def test_added_and_changed_endpoints_keep_spec_order(tmp_path, intro):
+    fake = page(intro)
+    sync(tmp_path, fake, [('/b', 'B'), ('/c', 'C'), ('/d', 'D')])
+
+    # 先頭に追加したエンドポイントと、同じ並びにある変更されたエンドポイント
+    paths = [('/a', 'A'), ('/b', 'B changed'), ('/c', 'C'), ('/d', 'D')]
+    sync(tmp_path, fake, paths)
+
+    expected = page(intro)
+    (tmp_path / 'fresh').mkdir()
+    sync(tmp_path / 'fresh', expected, paths)
+    assert fake.tree(PAGE_ID) == expected.tree(PAGE_ID)